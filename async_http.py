@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Minimal HTTP/1.1 over asyncio streams (standard library only).
+Server side: a keep-alive connection loop around a request handler.
+Client side: a keep-alive connection pool for one host.
+Bodies use Content-Length; chunked transfer encoding is not supported.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+MAX_HEADER_LINES = 100
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+# handler(method, path, headers, body) -> (status, response headers, response body)
+Handler = Callable[[str, str, Dict[str, str], bytes], Awaitable[Tuple[int, Dict[str, str], bytes]]]
+
+class HTTPError(Exception):
+    """Malformed HTTP message, or a non-retryable error response."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+async def _read_headers(reader: asyncio.StreamReader) -> Dict[str, str]:
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            return headers
+        name, sep, value = line.decode("latin-1").partition(":")
+        if not sep:
+            raise HTTPError(f"Malformed header line: {line!r}")
+        headers[name.strip().lower()] = value.strip()
+    raise HTTPError("Too many header lines")
+
+async def _read_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> bytes:
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HTTPError("Chunked transfer encoding is not supported")
+    length = int(headers.get("content-length", "0") or 0)
+    if length > MAX_BODY_BYTES:
+        raise HTTPError("Body too large", status=413)
+    return await reader.readexactly(length) if length else b""
+
+def _render(start_line: str, headers: Dict[str, str], body: bytes) -> bytes:
+    head = [start_line] + [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body
+
+class ServerConnections:
+    """
+    Keep-alive connections of one server. Shutdown closes the idle ones
+    at once and the busy ones after their current response; otherwise
+    Server.wait_closed() (Python 3.12+) waits out every idle timeout.
+    """
+
+    def __init__(self):
+        self.idle: Set[asyncio.StreamWriter] = set()
+        self.closing = False
+
+    def close_idle(self):
+        """Close idle connections now and every other one after its next response."""
+        self.closing = True
+        for writer in list(self.idle):
+            writer.close()
+
+async def _serve_connection(handler: Handler, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter, idle_timeout: float,
+                            connections: ServerConnections):
+    try:
+        while not connections.closing:
+            # Keep-alive: wait for the next request on this connection
+            connections.idle.add(writer)
+            try:
+                request_line = await asyncio.wait_for(reader.readline(), idle_timeout)
+            except asyncio.TimeoutError:
+                break
+            finally:
+                connections.idle.discard(writer)
+            if not request_line:
+                break
+
+            keep_alive = True
+            try:
+                method, path, version = request_line.decode("latin-1").split()
+                headers = await _read_headers(reader)
+                body = await _read_body(reader, headers)
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+                status, response_headers, response_body = await handler(method, path, headers, body)
+                keep_alive = keep_alive and not connections.closing
+            except (HTTPError, ValueError) as e:
+                keep_alive = False
+                status = getattr(e, "status", 400)
+                response_headers = {"Content-Type": "text/plain; charset=utf-8"}
+                response_body = str(e).encode("utf-8")
+
+            response_headers = dict(response_headers)
+            response_headers["Content-Length"] = str(len(response_body))
+            response_headers["Connection"] = "keep-alive" if keep_alive else "close"
+            writer.write(_render(f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}",
+                                 response_headers, response_body))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    except asyncio.CancelledError:
+        # Loop shutdown while the connection sat idle; nothing to report
+        pass
+    finally:
+        writer.close()
+
+async def start_server(handler: Handler, host: str = "127.0.0.1", port: int = 0,
+                       idle_timeout: float = 30.0,
+                       connections: Optional[ServerConnections] = None) -> asyncio.AbstractServer:
+    """
+    Start serving handler with keep-alive connections; port 0 picks a free port.
+    Pass connections to be able to close idle keep-alive connections on shutdown.
+    """
+    connections = connections or ServerConnections()
+    return await asyncio.start_server(
+        lambda reader, writer: _serve_connection(handler, reader, writer, idle_timeout, connections),
+        host, port
+    )
+
+def server_url(server: asyncio.AbstractServer) -> str:
+    """Base URL of a started server."""
+    host, port = server.sockets[0].getsockname()[:2]
+    return f"http://{host}:{port}"
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP/1.1 client connections to one host.
+    Each request borrows an idle connection (or opens one) and returns it
+    afterwards, so sequential and concurrent requests reuse sockets.
+    """
+
+    def __init__(self, base_url: str, max_idle: int = 32):
+        parts = urlsplit(base_url)
+        if parts.scheme != "http":
+            raise ValueError(f"Only http:// URLs are supported, got {base_url!r}")
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.base_path = parts.path.rstrip("/")
+        self.max_idle = max_idle
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self.connections_opened = 0
+
+    async def _acquire(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        self.connections_opened += 1
+        return await asyncio.open_connection(self.host, self.port)
+
+    def _release(self, connection: Tuple[asyncio.StreamReader, asyncio.StreamWriter], reusable: bool):
+        if reusable and len(self._idle) < self.max_idle:
+            self._idle.append(connection)
+        else:
+            connection[1].close()
+
+    async def request(self, method: str, path: str, body: bytes = b"",
+                      headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        """Send one request and return (status, headers, body)."""
+        connection = await self._acquire()
+        reader, writer = connection
+        reusable = False
+        try:
+            request_headers = {"Host": f"{self.host}:{self.port}", "Connection": "keep-alive",
+                               "Content-Length": str(len(body))}
+            request_headers.update(headers or {})
+            writer.write(_render(f"{method} {self.base_path}{path} HTTP/1.1", request_headers, body))
+            await writer.drain()
+
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionError("Server closed the connection")
+            status = int(status_line.split()[1])
+            response_headers = await _read_headers(reader)
+            response_body = await _read_body(reader, response_headers)
+            reusable = response_headers.get("connection", "").lower() != "close"
+            return status, response_headers, response_body
+        finally:
+            # A cancelled or failed exchange leaves the stream in an unknown state
+            self._release(connection, reusable)
+
+    async def close(self):
+        """Close every idle connection."""
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
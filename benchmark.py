@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for the three parts on deterministic synthetic data.
+For each workload and record count it reports throughput, p50/p99
+latency per item and peak traced memory (tracemalloc, measured per run
+in a separate pass so tracing does not distort timings), and saves everything
+as JSON. Pass a previous results file with --compare to flag regressions.
+
+Run: python benchmark.py --sizes 1e3,1e4,1e5
+     python benchmark.py --sizes 1e7 --workloads tagging --no-memory
+     python benchmark.py --output new.json --compare old.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, List, Optional
+
+import part_a_email_tagging as part_a
+import part_b_sentiment_analysis as part_b
+import part_c_rag_system as part_c
+from reporting import percentile, write_lines
+from synthetic_data import customer_ids, customer_tags, generate_articles, generate_emails, generate_queries
+
+WORKLOADS = ("tagging", "sentiment", "retrieval")
+
+# Latency samples kept per run; longer runs sample every n-th item
+MAX_LATENCY_SAMPLES = 100_000
+
+def measure(items: Iterable, count: int, operation: Callable) -> Dict:
+    """
+    Time operation(item) for every item; producing the items is not timed.
+    Returns: items, busy seconds, throughput and p50/p99 latency in ms
+    """
+    stride = max(1, count // MAX_LATENCY_SAMPLES)
+    samples: List[float] = []
+    busy = 0.0
+    done = 0
+    clock = time.perf_counter
+    for item in items:
+        start = clock()
+        operation(item)
+        elapsed = clock() - start
+        busy += elapsed
+        if done % stride == 0:
+            samples.append(elapsed)
+        done += 1
+
+    samples.sort()
+    return {
+        "items": done,
+        "busy_seconds": busy,
+        "throughput_per_sec": done / busy if busy else 0.0,
+        "latency_ms": {"p50": percentile(samples, 0.50) * 1000, "p99": percentile(samples, 0.99) * 1000},
+    }
+
+def start_peak():
+    """Start a run's peak memory window (when the tracemalloc pass is on)."""
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+def run_peak() -> Optional[int]:
+    """Peak traced bytes since start_peak(), or None outside the tracemalloc pass."""
+    return tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+
+def bench_tagging(size: int, seed: int) -> List[Dict]:
+    """Part A: classify a stream of emails, each with its own customer's classifier."""
+    start_peak()
+    emails = generate_emails(size, seed=seed)
+    registry = part_a.ClassifierRegistry()
+    for customer_id in customer_ids(max(10, size // 1000)):
+        registry.set_schema(customer_id, customer_tags(customer_id, seed))
+
+    def classify(email: Dict):
+        registry.get(email["customer_id"]).classify(email["subject"], email["body"])
+
+    stats = measure(emails, size, classify)
+    return [{"workload": "tagging", **stats, "peak_memory_bytes": run_peak()}]
+
+def bench_sentiment(size: int, seed: int) -> List[Dict]:
+    """Part B: run every prompt variant's analyzer over the same emails."""
+    results = []
+    for name, variant in part_b.PROMPT_VARIANTS.items():
+        start_peak()
+        texts = (f"{email['subject']} {email['body']}" for email in generate_emails(size, seed=seed))
+        stats = measure(texts, size, variant["analyzer"])
+        results.append({"workload": f"sentiment_{name}", **stats, "peak_memory_bytes": run_peak()})
+    return results
+
+def bench_retrieval(size: int, seed: int, backends: List[str], num_queries: int) -> List[Dict]:
+    """Part C: build each backend's index over size articles, then time single queries."""
+    articles = list(generate_articles(size, seed=seed))
+    queries = list(generate_queries(num_queries, seed=seed))
+    results = []
+    for backend in backends:
+        start_peak()
+        start = time.perf_counter()
+        index = part_c.RETRIEVAL_BACKENDS[backend](articles)
+        build_seconds = time.perf_counter() - start
+        stats = measure(queries, len(queries), lambda query: index.search(query, top_k=2, threshold=0.1))
+        results.append({"workload": f"retrieval_{backend}", "build_seconds": build_seconds, **stats,
+                        "peak_memory_bytes": run_peak()})
+        del index
+    return results
+
+def run_workload(workload: str, size: int, args) -> List[Dict]:
+    if workload == "tagging":
+        return bench_tagging(size, args.seed)
+    if workload == "sentiment":
+        return bench_sentiment(size, args.seed)
+    return bench_retrieval(size, args.seed, args.backends, args.queries)
+
+def run_benchmarks(args) -> Dict:
+    """
+    Every (workload, size) pair: a timed pass, then a tracemalloc pass that
+    measures each run's (backend's, variant's) own peak memory.
+    """
+    results = []
+    for workload in args.workloads:
+        for size in args.sizes:
+            if workload == "retrieval" and size > args.max_articles:
+                sys.stderr.write(f"skipping retrieval at {size} records (--max-articles {args.max_articles})\n")
+                continue
+            sys.stderr.write(f"{workload} x {size} ...\n")
+            runs = run_workload(workload, size, args)
+            peaks = {}
+            if args.memory:
+                tracemalloc.start()
+                try:
+                    peaks = {run["workload"]: run["peak_memory_bytes"] for run in run_workload(workload, size, args)}
+                finally:
+                    tracemalloc.stop()
+            for run in runs:
+                run["size"] = size
+                run["peak_memory_bytes"] = peaks.get(run["workload"])
+            results.extend(runs)
+
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "queries": args.queries,
+        },
+        "results": results,
+    }
+
+def report_lines(report: Dict) -> List[str]:
+    lines = [
+        "="*60,
+        "Scaling Benchmark",
+        "="*60,
+        f"{'workload':<20}{'size':>10}{'items/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'peak MiB':>10}",
+    ]
+    for run in report["results"]:
+        peak = run["peak_memory_bytes"]
+        lines.append(f"{run['workload']:<20}{run['size']:>10}{run['throughput_per_sec']:>12.0f}"
+                     f"{run['latency_ms']['p50']:>10.3f}{run['latency_ms']['p99']:>10.3f}"
+                     f"{(peak / 1024 / 1024 if peak is not None else float('nan')):>10.1f}")
+    return lines
+
+def compare_lines(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Compare runs present in both reports. A run regresses when throughput
+    drops, or p99 latency grows, by more than tolerance (a fraction).
+    """
+    previous = {(run["workload"], run["size"]): run for run in baseline["results"]}
+    lines = ["", f"{'workload':<20}{'size':>10}{'throughput':>12}{'p99':>10}  status"]
+    for run in report["results"]:
+        old = previous.get((run["workload"], run["size"]))
+        if old is None:
+            continue
+        throughput = run["throughput_per_sec"] / old["throughput_per_sec"] if old["throughput_per_sec"] else 1.0
+        p99 = run["latency_ms"]["p99"] / old["latency_ms"]["p99"] if old["latency_ms"]["p99"] else 1.0
+        regressed = throughput < 1 - tolerance or p99 > 1 + tolerance
+        lines.append(f"{run['workload']:<20}{run['size']:>10}{throughput:>11.2f}x{p99:>9.2f}x  "
+                     f"{'REGRESSION' if regressed else 'ok'}")
+    return lines
+
+def _sizes(text: str) -> List[int]:
+    return [int(float(size)) for size in text.split(",")]
+
+def main(argv: Optional[List[str]] = None):
+    """Main execution function."""
+    parser = argparse.ArgumentParser(description="Scaling benchmark on synthetic data")
+    parser.add_argument("--sizes", type=_sizes, default=[1000, 10000, 100000],
+                        help="comma-separated record counts, e.g. 1e3,1e4,1e5 (default)")
+    parser.add_argument("--workloads", type=lambda text: text.split(","), default=list(WORKLOADS),
+                        help=f"comma-separated subset of {','.join(WORKLOADS)}")
+    parser.add_argument("--backends", type=lambda text: text.split(","), default=list(part_c.RETRIEVAL_BACKENDS),
+                        help="retrieval backends to benchmark")
+    parser.add_argument("--queries", type=int, default=500, help="retrieval queries per size")
+    parser.add_argument("--max-articles", type=int, default=100_000,
+                        help="skip retrieval above this many articles (index build is in memory)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="skip the tracemalloc pass (halves the run time)")
+    parser.add_argument("--output", default="benchmark_results.json", help="results JSON path")
+    parser.add_argument("--compare", metavar="BASELINE", help="previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="--compare: allowed fractional slowdown (default: 0.10)")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+    unknown = set(args.backends) - set(part_c.RETRIEVAL_BACKENDS)
+    if unknown:
+        parser.error(f"unknown backends: {', '.join(sorted(unknown))}")
+
+    report = run_benchmarks(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    lines = report_lines(report)
+    regressed = False
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            comparison = compare_lines(report, json.load(f), args.tolerance)
+        regressed = any(line.endswith("REGRESSION") for line in comparison)
+        lines += comparison
+    lines.append(f"\nResults saved to {args.output}")
+    write_lines(lines)
+    if regressed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Stage timing and counters for the tagging, sentiment and RAG pipelines.
+Spans time pipeline stages into a shared "stage_seconds" histogram;
+counters, gauges and histograms take optional labels (e.g. customer_id).
+Snapshots export as JSON or Prometheus text; gauges derived from other
+metrics are set by collectors at snapshot time, not on every update.
+Metrics are off by default:
+then span() returns a shared no-op context and every update returns at
+once, and hot loops check METRICS.enabled before building labels at all.
+
+Enable with --metrics PATH on any script, or PIPELINE_METRICS=1.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Upper bounds in seconds, from 10 microseconds to 10 seconds
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL_SPAN = nullcontext()
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+class _Span:
+    """Times one stage; a failing stage also counts in stage_errors_total."""
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics: "Metrics", stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe("stage_seconds", time.perf_counter() - self.start, stage=self.stage)
+        if exc_type is not None:
+            self.metrics.inc("stage_errors_total", stage=self.stage)
+        return False
+
+class Metrics:
+    """
+    Thread-safe registry of labeled counters, gauges and histograms.
+    Histograms use fixed upper bounds (buckets), so memory stays constant
+    no matter how many values are observed.
+    """
+
+    def __init__(self, enabled: bool = False, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        # name -> labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._histograms: Dict[str, Dict[LabelKey, List]] = {}
+        # Called before every snapshot to set derived gauges
+        self._collectors: List[Callable[[], None]] = []
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Add value to a counter."""
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        """Set a gauge."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record one value in a histogram."""
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][bisect_left(self.buckets, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def span(self, stage: str):
+        """Context manager timing a pipeline stage (a no-op while disabled)."""
+        return _Span(self, stage) if self.enabled else _NULL_SPAN
+
+    def timed(self, stage: str) -> Callable:
+        """Decorator form of span(); checks enabled on every call, not at decoration."""
+        def decorator(func: Callable) -> Callable:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Run collector() before each snapshot, e.g. to set gauges computed from counters."""
+        self._collectors.append(collector)
+
+    def counter_values(self, name: str) -> Dict[LabelKey, float]:
+        """Current values of one counter, keyed by sorted (label, value) pairs."""
+        with self._lock:
+            return dict(self._counters.get(name, {}))
+
+    def reset(self):
+        """Drop every recorded value (enabled is unchanged)."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def _quantile(self, counts: List[int], total: int, fraction: float) -> float:
+        # Upper bound of the bucket holding the quantile; +Inf reports the largest bound
+        rank = fraction * total
+        seen = 0
+        for bound, count in zip(self.buckets, counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def snapshot(self) -> Dict:
+        """
+        JSON-ready copy of every metric. Histograms carry cumulative bucket
+        counts plus count, sum, mean and bucket-resolution p50/p99.
+        """
+        for collector in self._collectors:
+            collector()
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            gauges = {name: dict(series) for name, series in self._gauges.items()}
+            histograms = {name: {key: [list(h[0]), h[1], h[2]] for key, h in series.items()}
+                          for name, series in self._histograms.items()}
+
+        def values(metrics):
+            return {name: [{"labels": dict(key), "value": value} for key, value in sorted(series.items())]
+                    for name, series in sorted(metrics.items())}
+
+        snapshot = {"counters": values(counters), "gauges": values(gauges), "histograms": {}}
+        for name, series in sorted(histograms.items()):
+            entries = snapshot["histograms"][name] = []
+            for key, (counts, total_sum, count) in sorted(series.items()):
+                cumulative, running = {}, 0
+                for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                    running += bucket_count
+                    cumulative[str(bound)] = running
+                entries.append({
+                    "labels": dict(key),
+                    "count": count,
+                    "sum": total_sum,
+                    "mean": total_sum / count if count else 0.0,
+                    "p50": self._quantile(counts, count, 0.50),
+                    "p99": self._quantile(counts, count, 0.99),
+                    "buckets": cumulative,
+                })
+        return snapshot
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        for kind in ("counters", "gauges"):
+            for name, entries in snapshot[kind].items():
+                lines.append(f"# TYPE {name} {kind[:-1]}")
+                for entry in entries:
+                    lines.append(f"{name}{_prometheus_labels(entry['labels'])} {entry['value']}")
+        for name, entries in snapshot["histograms"].items():
+            lines.append(f"# TYPE {name} histogram")
+            for entry in entries:
+                for bound, count in entry["buckets"].items():
+                    labels = _prometheus_labels({**entry["labels"], "le": bound})
+                    lines.append(f"{name}_bucket{labels} {count}")
+                labels = _prometheus_labels(entry["labels"])
+                lines.append(f"{name}_sum{labels} {entry['sum']}")
+                lines.append(f"{name}_count{labels} {entry['count']}")
+        return "\n".join(lines) + "\n"
+
+def _prometheus_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (name + '="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+               for name, value in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+# Shared registry for all pipelines
+METRICS = Metrics(enabled=os.environ.get("PIPELINE_METRICS", "") not in ("", "0"))
+
+METRICS_FORMATS = ("json", "prometheus")
+
+def add_metrics_arguments(parser: argparse.ArgumentParser):
+    """Add the shared --metrics switches to a script's CLI."""
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="record stage timings and counters, and write a snapshot here ('-' for stderr)")
+    parser.add_argument("--metrics-format", choices=METRICS_FORMATS, default="json",
+                        help="--metrics: snapshot format (default: json)")
+
+def enable_from_args(args):
+    """Turn METRICS on when --metrics was given."""
+    if args.metrics:
+        METRICS.enabled = True
+
+def export_metrics(args, metrics: Optional[Metrics] = None):
+    """Write the --metrics snapshot, if one was requested; stdout reports stay unchanged."""
+    if not args.metrics:
+        return
+    metrics = metrics or METRICS
+    text = metrics.to_prometheus() if args.metrics_format == "prometheus" else metrics.to_json() + "\n"
+    if args.metrics == "-":
+        sys.stderr.write(text)
+        return
+    with open(args.metrics, "w", encoding="utf-8") as f:
+        f.write(text)
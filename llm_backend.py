@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Pluggable model backends for Part B sentiment analysis and Part C answer
+generation, plus a local stub model server for offline benchmarking.
+
+Backends take request dicts ({"task": "sentiment" | "rag", "prompt", "input",
+...}, built by part_b/part_c helpers) and return one output string each.
+MockBackend runs the existing keyword/template mocks in-process and stays
+the default; HTTPBackend batches requests to a model server over pooled
+keep-alive connections.
+
+Run: python llm_backend.py serve --port 8808
+     python llm_backend.py bench --requests 5000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from async_http import ConnectionPool, HTTPError, server_url, start_server
+from instrumentation import METRICS
+from reporting import percentile
+from response_cache import DEFAULT_MAX_BYTES, ResponseCache, cache_key, stats_line
+
+# Statuses worth retrying: the server was overloaded or briefly unavailable
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+def mock_complete(request: Dict) -> str:
+    """Answer one request with the keyword/template mocks from Parts B and C."""
+    # Imported here so each part only loads when its task is used
+    task = request.get("task")
+    if task == "sentiment":
+        from part_b_sentiment_analysis import PROMPT_VARIANTS
+        output = PROMPT_VARIANTS[request.get("prompt_version", "v2")]["analyzer"](request["input"])
+        return output if isinstance(output, str) else json.dumps(output)
+    if task == "rag":
+        from part_c_rag_system import generate_answer
+        # Requests carry no retrieval scores; the answer text does not depend on them
+        retrieved = [(article, 0.0) for article in request.get("context", [])]
+        return generate_answer(request["input"], retrieved)["answer"]
+    raise ValueError(f"Unknown task: {task!r}")
+
+class LLMBackend(ABC):
+    """Backend interface: complete a batch of requests, one output string each."""
+
+    model_id = "base"
+
+    @abstractmethod
+    async def complete_batch(self, requests: List[Dict]) -> List[str]:
+        """One output string per request, in input order."""
+
+    async def complete(self, request: Dict) -> str:
+        return (await self.complete_batch([request]))[0]
+
+    async def stream(self, request: Dict) -> AsyncIterator[str]:
+        """Output of one request in chunks; backends without streaming yield it whole."""
+        yield await self.complete(request)
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self) -> "LLMBackend":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+class MockBackend(LLMBackend):
+    """In-process keyword/template mocks (the default backend)."""
+
+    model_id = "mock"
+
+    async def complete_batch(self, requests: List[Dict]) -> List[str]:
+        return [mock_complete(request) for request in requests]
+
+class HTTPBackend(LLMBackend):
+    """
+    Asyncio client for a batch completion endpoint (POST /v1/batch).
+    Concurrent complete() calls are coalesced into batches of up to
+    batch_size, waiting at most max_wait seconds to fill one. At most
+    `concurrency` batches are in flight, connections are kept alive and
+    reused, and each batch gets a timeout and retries with exponential
+    backoff and jitter on connection errors, timeouts and 429/5xx.
+    """
+
+    def __init__(self, url: str, model_id: str = "stub", batch_size: int = 32,
+                 max_wait: float = 0.002, concurrency: int = 8, timeout: float = 30.0,
+                 retries: int = 3, backoff: float = 0.05):
+        self.model_id = model_id
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool = ConnectionPool(url, max_idle=concurrency)
+        self.stats = {"requests": 0, "batches": 0, "retries": 0, "failed_batches": 0}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight = set()
+
+    async def complete(self, request: Dict) -> str:
+        if self._worker is None:
+            # Bind the queue and batching task to the running loop on first use
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.concurrency)
+            self._worker = asyncio.get_running_loop().create_task(self._batch_loop())
+        future = asyncio.get_running_loop().create_future()
+        self.stats["requests"] += 1
+        self._queue.put_nowait((request, future))
+        return await future
+
+    async def complete_batch(self, requests: List[Dict]) -> List[str]:
+        return list(await asyncio.gather(*(self.complete(request) for request in requests)))
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        batch: List[Tuple[Dict, asyncio.Future]] = []
+        try:
+            while True:
+                # Take a send slot first: while all are busy, requests pile up into fuller batches
+                await self._slots.acquire()
+                batch = [await queue.get()]
+                while len(batch) < self.batch_size and not queue.empty():
+                    batch.append(queue.get_nowait())
+                if len(batch) < self.batch_size and self.max_wait > 0:
+                    await asyncio.sleep(self.max_wait)
+                    while len(batch) < self.batch_size and not queue.empty():
+                        batch.append(queue.get_nowait())
+
+                task = loop.create_task(self._dispatch(batch))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+                batch = []
+        finally:
+            # Cancelled by close(): fail the batch being filled and everything still queued
+            closed = RuntimeError("HTTPBackend was closed before the request was sent")
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(closed)
+
+    async def _dispatch(self, batch: List[Tuple[Dict, asyncio.Future]]):
+        try:
+            # Skip requests whose callers were cancelled while queued
+            live = [(request, future) for request, future in batch if not future.done()]
+            if not live:
+                return
+            outputs = await self._send([request for request, _ in live])
+            for (_, future), output in zip(live, outputs):
+                if not future.done():
+                    future.set_result(output)
+        except Exception as e:
+            self.stats["failed_batches"] += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    async def _send(self, requests: List[Dict]) -> List[str]:
+        body = json.dumps({"model": self.model_id, "requests": requests}).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        self.stats["batches"] += 1
+
+        error: Exception = RuntimeError("no attempt made")
+        for attempt in range(self.retries + 1):
+            try:
+                status, _, payload = await asyncio.wait_for(
+                    self.pool.request("POST", "/v1/batch", body, headers), self.timeout
+                )
+                if status == 200:
+                    outputs = json.loads(payload)["outputs"]
+                    if len(outputs) != len(requests):
+                        raise HTTPError(f"Expected {len(requests)} outputs, got {len(outputs)}", 500)
+                    return outputs
+                error = HTTPError(f"Backend returned HTTP {status}: {payload[:200]!r}", status)
+                if status not in RETRYABLE_STATUSES:
+                    raise error
+            except (asyncio.TimeoutError, ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+                error = e
+
+            if attempt < self.retries:
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+        raise error
+
+    async def close(self):
+        """Fail requests not sent yet, wait for in-flight batches, then close connections."""
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        await self.pool.close()
+
+def request_key(request: Dict, model_id: str) -> str:
+    """Content address of a request: its prompt text, the model, and everything else it carries."""
+    inputs = {name: value for name, value in request.items() if name != "prompt"}
+    return cache_key(request.get("prompt", ""), model_id,
+                     json.dumps(inputs, sort_keys=True, ensure_ascii=False))
+
+class CachedBackend(LLMBackend):
+    """
+    Wraps a backend with a persistent ResponseCache.
+    Only requests whose (prompt, model, input) were never seen before reach
+    the wrapped backend, each unique one once per batch.
+    """
+
+    def __init__(self, backend: LLMBackend, cache: ResponseCache):
+        self.backend = backend
+        self.cache = cache
+        self.model_id = backend.model_id
+
+    async def complete_batch(self, requests: List[Dict]) -> List[str]:
+        keys = [request_key(request, self.model_id) for request in requests]
+        outputs = self.cache.get_many(keys)
+        missing = {}
+        for key, request in zip(keys, requests):
+            if key not in outputs:
+                missing.setdefault(key, request)
+        METRICS.inc("cache_hits_total", len(keys) - len(missing), cache="response")
+        METRICS.inc("cache_misses_total", len(missing), cache="response")
+        if missing:
+            fresh = dict(zip(missing, await self.backend.complete_batch(list(missing.values()))))
+            self.cache.put_many(fresh, self.model_id)
+            outputs.update(fresh)
+        return [outputs[key] for key in keys]
+
+    async def close(self):
+        await self.backend.close()
+        self.cache.close()
+
+def add_model_arguments(parser: argparse.ArgumentParser):
+    """Add the shared model backend / response cache switches to a script's CLI."""
+    parser.add_argument("--model-url", metavar="URL",
+                        help="send model calls to this server (default: in-process mocks)")
+    parser.add_argument("--response-cache", metavar="PATH",
+                        help="persistent SQLite cache of model responses")
+    parser.add_argument("--response-cache-mb", type=float, default=DEFAULT_MAX_BYTES / 1024 / 1024,
+                        help="--response-cache: size limit before LRU eviction (default: 256)")
+
+def backend_from_args(args) -> Optional[LLMBackend]:
+    """Backend selected by add_model_arguments() switches; None keeps the direct mock path."""
+    if args.model_url is None and args.response_cache is None:
+        return None
+    backend = HTTPBackend(args.model_url) if args.model_url else MockBackend()
+    if args.response_cache:
+        cache = ResponseCache(args.response_cache, int(args.response_cache_mb * 1024 * 1024))
+        backend = CachedBackend(backend, cache)
+    return backend
+
+def run_and_close(backend: LLMBackend, coroutine):
+    """Run coroutine on a fresh event loop, then close backend on that loop."""
+    async def runner():
+        try:
+            return await coroutine
+        finally:
+            await backend.close()
+    return asyncio.run(runner())
+
+def report_cache_stats(backend: Optional[LLMBackend]):
+    """Print response cache hit rates to stderr, keeping stdout reports unchanged."""
+    if isinstance(backend, CachedBackend):
+        sys.stderr.write(stats_line(backend.cache.stats()) + "\n")
+
+def make_stub_handler(latency_ms: float = 40.0, per_item_ms: float = 1.0, jitter: float = 0.3,
+                      error_rate: float = 0.0, seed: Optional[int] = None):
+    """
+    Request handler for the stub model server.
+    A batch of n requests takes (latency_ms + n * per_item_ms), scaled by a
+    lognormal factor with sigma=jitter for a realistic latency tail; a
+    fraction error_rate of batches fails with 503. Outputs come from
+    mock_complete, so results match MockBackend.
+    """
+    rng = random.Random(seed)
+
+    async def handle(method: str, path: str, headers: Dict[str, str], body: bytes):
+        if path == "/health":
+            return 200, {"Content-Type": "application/json"}, b'{"status": "ok"}'
+        if path != "/v1/batch":
+            return 404, {"Content-Type": "text/plain"}, b"Not found"
+        if method != "POST":
+            return 405, {"Content-Type": "text/plain"}, b"Use POST"
+
+        payload = json.loads(body)
+        requests = payload["requests"]
+        delay = (latency_ms + per_item_ms * len(requests)) / 1000
+        await asyncio.sleep(delay * math.exp(rng.gauss(0, jitter)) if jitter else delay)
+        if error_rate and rng.random() < error_rate:
+            return 503, {"Content-Type": "text/plain"}, b"Simulated overload"
+
+        outputs = [mock_complete(request) for request in requests]
+        response = {"model": payload.get("model", "stub"), "outputs": outputs}
+        return 200, {"Content-Type": "application/json"}, json.dumps(response).encode("utf-8")
+
+    return handle
+
+async def serve_stub(host: str = "127.0.0.1", port: int = 8808, **latency):
+    """Run the stub model server until cancelled."""
+    server = await start_server(make_stub_handler(**latency), host, port)
+    print(f"Stub model server listening on {server_url(server)}")
+    async with server:
+        await server.serve_forever()
+
+async def benchmark(backend: LLMBackend, requests: List[Dict], concurrency: int) -> Dict:
+    """
+    Push requests through backend.complete() from `concurrency` callers.
+    Returns: throughput and per-request latency percentiles
+    """
+    latencies: List[float] = []
+    pending = iter(requests)
+
+    async def caller():
+        for request in pending:
+            start = time.perf_counter()
+            await backend.complete(request)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "throughput_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": {name: percentile(latencies, q) * 1000
+                       for name, q in (("p50", 0.50), ("p90", 0.90), ("p99", 0.99))},
+    }
+
+async def _run_benchmark(args) -> Dict:
+    from part_b_sentiment_analysis import TEST_EMAILS, sentiment_request
+
+    requests = [sentiment_request(f"{email['subject']} {email['body']}", "v2")
+                for email in TEST_EMAILS]
+    requests = [requests[i % len(requests)] for i in range(args.requests)]
+
+    server = None
+    url = args.url
+    if url is None:
+        server = await start_server(make_stub_handler(args.latency_ms, args.per_item_ms,
+                                                      args.jitter, args.error_rate, seed=0))
+        url = server_url(server)
+
+    backend = HTTPBackend(url, batch_size=args.batch_size, max_wait=args.max_wait_ms / 1000,
+                          concurrency=args.max_inflight, timeout=args.timeout)
+    try:
+        report = await benchmark(backend, requests, args.concurrency)
+    finally:
+        await backend.close()
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+    report.update(backend.stats)
+    report["connections_opened"] = backend.pool.connections_opened
+    return report
+
+def main(argv: Optional[List[str]] = None):
+    """Main execution function."""
+    parser = argparse.ArgumentParser(description="Model backends: stub server and benchmark")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="run the stub model server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8808)
+
+    bench = commands.add_parser("bench", help="benchmark HTTPBackend against a (stub) server")
+    bench.add_argument("--url", help="model server URL (default: start an in-process stub)")
+    bench.add_argument("--requests", type=int, default=2000)
+    bench.add_argument("--concurrency", type=int, default=64, help="concurrent callers")
+    bench.add_argument("--batch-size", type=int, default=32)
+    bench.add_argument("--max-wait-ms", type=float, default=2.0)
+    bench.add_argument("--max-inflight", type=int, default=8, help="concurrent batches")
+    bench.add_argument("--timeout", type=float, default=30.0)
+
+    for command in (serve, bench):
+        command.add_argument("--latency-ms", type=float, default=40.0, help="stub: base latency per batch")
+        command.add_argument("--per-item-ms", type=float, default=1.0, help="stub: added latency per request")
+        command.add_argument("--jitter", type=float, default=0.3, help="stub: lognormal latency sigma")
+        command.add_argument("--error-rate", type=float, default=0.0, help="stub: fraction of 503 batches")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        try:
+            asyncio.run(serve_stub(args.host, args.port, latency_ms=args.latency_ms,
+                                   per_item_ms=args.per_item_ms, jitter=args.jitter,
+                                   error_rate=args.error_rate))
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(json.dumps(asyncio.run(_run_benchmark(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
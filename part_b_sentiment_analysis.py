@@ -6,8 +6,17 @@ Standalone script for evaluating sentiment analysis prompts.
 Run: python part_b_sentiment_analysis.py
 """
 
+import argparse
+import asyncio
 import json
-from typing import Dict, List
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from instrumentation import METRICS, add_metrics_arguments, enable_from_args, export_metrics
+from llm_backend import add_model_arguments, backend_from_args, report_cache_stats, run_and_close
+from reporting import add_output_arguments, percentile, write_csv, write_json, write_lines
 
 # Test emails (10 emails as required)
 TEST_EMAILS = [
@@ -33,6 +42,12 @@ TEST_EMAILS = [
      "body": "Dark mode would help during late-night support hours. Please consider this."},
 ]
 
+# Human sentiment labels for TEST_EMAILS, by email id
+TEST_LABELS = {
+    1: "negative", 2: "negative", 3: "negative", 4: "negative", 5: "negative",
+    6: "negative", 7: "negative", 8: "negative", 9: "neutral", 10: "positive",
+}
+
 # Prompt Versions
 PROMPT_V1 = """Analyze the sentiment of the following email. 
 Return only Positive, Negative, or Neutral."""
@@ -55,42 +70,55 @@ Rules:
 Email:
 """
 
-def analyze_sentiment_v1(email_text: str) -> str:
+# Keyword groups scanned once per email and shared by every prompt version
+KEYWORD_GROUPS = {
+    "negative": ["unable", "error", "fail", "stuck", "not working", "missing", "disappeared"],
+    "neutral": ["help", "guide", "query", "need"],
+    "positive": ["feature", "consider", "request"],
+}
+
+def extract_features(email_text: str) -> FrozenSet[str]:
     """
-    Mock sentiment analysis using Prompt V1 (basic).
-    Returns: "Positive", "Negative", or "Neutral"
+    Lowercase the email once and check each keyword group with C-level
+    substring searches, stopping at a group's first hit.
+    Returns: names of the keyword groups with at least one keyword present
+    (same semantics as `keyword in text`)
     """
     text = email_text.lower()
-    
-    if any(word in text for word in ["unable", "error", "fail", "stuck", "not working", "missing", "disappeared"]):
+    found = []
+    for name, words in KEYWORD_GROUPS.items():
+        for word in words:
+            if word in text:
+                found.append(name)
+                break
+    return frozenset(found)
+
+def decide_v1(features: FrozenSet[str]) -> str:
+    """Prompt V1 decision logic over extracted features."""
+    if "negative" in features:
         return "Negative"
-    elif any(word in text for word in ["help", "guide", "query", "need"]):
+    elif "neutral" in features:
         return "Neutral"
-    elif any(word in text for word in ["feature", "consider", "request"]):
+    elif "positive" in features:
         return "Positive"
     else:
         return "Neutral"
 
-def analyze_sentiment_v2(email_text: str) -> Dict:
-    """
-    Mock sentiment analysis using Prompt V2 (structured).
-    Returns: {"sentiment": "...", "confidence": 0.0-1.0, "reasoning": "..."}
-    """
-    text = email_text.lower()
-    
+def decide_v2(features: FrozenSet[str]) -> Dict:
+    """Prompt V2 decision logic over extracted features."""
     sentiment = "neutral"
     confidence = 0.7
     reasoning = "Standard query."
     
-    if any(word in text for word in ["unable", "error", "fail", "stuck", "not working", "missing", "disappeared"]):
+    if "negative" in features:
         sentiment = "negative"
         confidence = 0.9
         reasoning = "User is reporting a failure or inability to perform an action."
-    elif any(word in text for word in ["help", "guide", "query", "need"]):
+    elif "neutral" in features:
         sentiment = "neutral"
         confidence = 0.8
         reasoning = "User is asking for information or assistance."
-    elif any(word in text for word in ["feature", "consider", "request"]):
+    elif "positive" in features:
         sentiment = "positive"
         confidence = 0.6
         reasoning = "User is suggesting improvements constructively."
@@ -101,102 +129,398 @@ def analyze_sentiment_v2(email_text: str) -> Dict:
         "reasoning": reasoning
     }
 
+def analyze_sentiment_v1(email_text: str) -> str:
+    """
+    Mock sentiment analysis using Prompt V1 (basic).
+    Returns: "Positive", "Negative", or "Neutral"
+    """
+    return decide_v1(extract_features(email_text))
+
+def analyze_sentiment_v2(email_text: str) -> Dict:
+    """
+    Mock sentiment analysis using Prompt V2 (structured).
+    Returns: {"sentiment": "...", "confidence": 0.0-1.0, "reasoning": "..."}
+    """
+    return decide_v2(extract_features(email_text))
+
+# Prompt variant registry: prompt text, feature-based decision logic and
+# the text-level analyzer. Variants without "decide" are run via "analyzer".
+PROMPT_VARIANTS = {
+    "v1": {"prompt": PROMPT_V1, "decide": decide_v1, "analyzer": analyze_sentiment_v1},
+    "v2": {"prompt": PROMPT_V2, "decide": decide_v2, "analyzer": analyze_sentiment_v2},
+}
+
+# Decision logic per prompt version, all run on the same extracted features
+PROMPT_DECISIONS = {name: variant["decide"] for name, variant in PROMPT_VARIANTS.items()}
+
+def evaluate_prompts(emails: Optional[List[Dict]] = None,
+                     decisions: Optional[Dict[str, Callable]] = None) -> Dict[str, List[Dict]]:
+    """
+    Evaluate several prompt versions with one text scan per email.
+    Returns: {version: [{"id", "subject", "output"}, ...]}
+    """
+    emails = TEST_EMAILS if emails is None else emails
+    decisions = PROMPT_DECISIONS if decisions is None else decisions
+    with METRICS.span("sentiment.features"):
+        features = [extract_features(f"{email['subject']} {email['body']}") for email in emails]
+    
+    results = {}
+    for version, decide in decisions.items():
+        with METRICS.span("sentiment.decide"):
+            results[version] = [{"id": email["id"], "subject": email["subject"], "output": decide(email_features)}
+                                for email, email_features in zip(emails, features)]
+        METRICS.inc("emails_analyzed_total", len(emails), prompt=version)
+    return results
+
 def evaluate_prompt_v1() -> List[Dict]:
     """Evaluate emails using Prompt V1."""
-    results = []
-    for email in TEST_EMAILS:
-        email_text = f"{email['subject']} {email['body']}"
-        sentiment = analyze_sentiment_v1(email_text)
-        
-        results.append({
-            "id": email["id"],
-            "subject": email["subject"],
-            "output": sentiment
-        })
-    return results
+    return evaluate_prompts(decisions={"v1": decide_v1})["v1"]
 
 def evaluate_prompt_v2() -> List[Dict]:
     """Evaluate emails using Prompt V2."""
-    results = []
-    for email in TEST_EMAILS:
-        email_text = f"{email['subject']} {email['body']}"
-        analysis = analyze_sentiment_v2(email_text)
+    return evaluate_prompts(decisions={"v2": decide_v2})["v2"]
+
+def sentiment_request(email_text: str, version: str = "v2") -> Dict:
+    """Build a model backend request for one email (see llm_backend.py)."""
+    return {"task": "sentiment", "prompt_version": version,
+            "prompt": PROMPT_VARIANTS[version]["prompt"], "input": email_text}
+
+def parse_sentiment_output(version: str, output: str):
+    """Parse a backend's output string into the analyzer's return type."""
+    return json.loads(output) if version == "v2" else output.strip()
+
+async def analyze_sentiment_batch_async(email_texts: List[str], version: str = "v2",
+                                        backend=None) -> List:
+    """
+    Analyze many emails through a model backend (e.g. llm_backend.HTTPBackend).
+    With no backend, the in-process mock analyzer is used.
+    Returns: one analyzer-style output per email, in input order
+    """
+    METRICS.inc("emails_analyzed_total", len(email_texts), prompt=version)
+    if backend is None:
+        analyzer = PROMPT_VARIANTS[version]["analyzer"]
+        with METRICS.span("sentiment.analyze"):
+            return [analyzer(text) for text in email_texts]
+    with METRICS.span("sentiment.model"):
+        outputs = await backend.complete_batch([sentiment_request(text, version) for text in email_texts])
+    return [parse_sentiment_output(version, output) for output in outputs]
+
+async def evaluate_prompts_async(backend, emails: Optional[List[Dict]] = None,
+                                 versions: Tuple[str, ...] = ("v1", "v2")) -> Dict[str, List[Dict]]:
+    """
+    Evaluate prompt versions through a model backend, all versions concurrently.
+    Returns: the same shape as evaluate_prompts()
+    """
+    emails = TEST_EMAILS if emails is None else emails
+    texts = [f"{email['subject']} {email['body']}" for email in emails]
+    outputs = await asyncio.gather(*(analyze_sentiment_batch_async(texts, version, backend)
+                                     for version in versions))
+    return {
+        version: [{"id": email["id"], "subject": email["subject"], "output": output}
+                  for email, output in zip(emails, version_outputs)]
+        for version, version_outputs in zip(versions, outputs)
+    }
+
+SENTIMENT_CLASSES = ("positive", "neutral", "negative")
+
+def normalize_sentiment(output) -> str:
+    """Map any variant's output (label string or V2-style dict) to a lowercase class."""
+    if isinstance(output, dict):
+        output = output["sentiment"]
+    return str(output).strip().lower()
+
+def labeled_test_emails() -> List[Dict]:
+    """TEST_EMAILS with their TEST_LABELS as a "label" field."""
+    return [{**email, "label": TEST_LABELS[email["id"]]} for email in TEST_EMAILS]
+
+def load_corpus(path: str) -> List[Dict]:
+    """Read a labeled JSONL corpus: one {"subject", "body", "label"} object per line."""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def _score_chunk(task: Tuple[List[Tuple[str, str, str]], Dict[str, Dict]]) -> Dict[str, Dict]:
+    """
+    Run every variant over one chunk of (subject, body, label) rows.
+    Features are extracted once per email and shared by all feature-based
+    variants. Returns per-variant confusion counts and per-email latencies;
+    a feature-based variant's latency includes the shared extraction.
+    """
+    rows, variants = task
+    texts = [f"{subject} {body}" for subject, body, _ in rows]
+    
+    clock = time.perf_counter
+    features = []
+    extraction = []
+    for text in texts:
+        t0 = clock()
+        features.append(extract_features(text))
+        extraction.append(clock() - t0)
+    
+    out = {}
+    for name, variant in variants.items():
+        decide = variant.get("decide")
+        run = decide if decide is not None else variant["analyzer"]
+        inputs = features if decide is not None else texts
+        
+        shared = extraction if decide is not None else [0.0] * len(rows)
+        
+        confusion: Dict[Tuple[str, str], int] = defaultdict(int)
+        latencies = []
+        for item, (_, _, label), shared_seconds in zip(inputs, rows, shared):
+            t0 = clock()
+            output = run(item)
+            latencies.append(clock() - t0 + shared_seconds)
+            confusion[(normalize_sentiment(label), normalize_sentiment(output))] += 1
+        out[name] = {"confusion": dict(confusion), "latencies": latencies}
+    return out
+
+def classification_metrics(confusion: Dict[Tuple[str, str], int]) -> Dict:
+    """Accuracy, per-class precision/recall/F1 and the confusion matrix from (label, predicted) counts."""
+    classes = list(SENTIMENT_CLASSES)
+    for label, predicted in confusion:
+        for name in (label, predicted):
+            if name not in classes:
+                classes.append(name)
+    
+    total = sum(confusion.values())
+    correct = sum(count for (label, predicted), count in confusion.items() if label == predicted)
+    per_class = {}
+    for name in classes:
+        tp = confusion.get((name, name), 0)
+        predicted = sum(c for (_, p), c in confusion.items() if p == name)
+        actual = sum(c for (l, _), c in confusion.items() if l == name)
+        precision = tp / predicted if predicted else 0.0
+        recall = tp / actual if actual else 0.0
+        per_class[name] = {
+            "precision": precision,
+            "recall": recall,
+            "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            "support": actual,
+        }
+    
+    return {
+        "total": total,
+        "accuracy": correct / total if total else 0.0,
+        "per_class": per_class,
+        "confusion_matrix": {
+            "classes": classes,
+            # rows: true label, columns: predicted
+            "matrix": [[confusion.get((label, predicted), 0) for predicted in classes] for label in classes],
+        },
+    }
+
+def run_ab_evaluation(corpus: List[Dict], variants: Optional[Dict[str, Dict]] = None,
+                      workers: int = 1, chunk_size: int = 10000) -> Dict[str, Dict]:
+    """
+    Evaluate every prompt variant over a labeled corpus in one batched pass.
+    The corpus is cut into chunks; each chunk extracts features once and runs
+    all variants on them, serially or over a process pool (variant functions
+    must then be module-level so they pickle).
+    Returns: {variant: metrics + latency/throughput}
+    """
+    variants = PROMPT_VARIANTS if variants is None else variants
+    rows = [(email["subject"], email["body"], email["label"]) for email in corpus]
+    tasks = [(rows[start:start + chunk_size], variants) for start in range(0, len(rows), chunk_size)]
+    
+    wall_start = time.perf_counter()
+    with METRICS.span("sentiment.ab_score"):
+        if workers <= 1:
+            chunk_outputs = [_score_chunk(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunk_outputs = list(executor.map(_score_chunk, tasks))
+    wall_seconds = time.perf_counter() - wall_start
+    
+    report = {}
+    for name in variants:
+        confusion: Dict[Tuple[str, str], int] = defaultdict(int)
+        latencies = []
+        for output in chunk_outputs:
+            for key, count in output[name]["confusion"].items():
+                confusion[key] += count
+            latencies.extend(output[name]["latencies"])
         
-        results.append({
-            "id": email["id"],
-            "subject": email["subject"],
-            "output": analysis
+        latencies.sort()
+        busy_seconds = sum(latencies)
+        metrics = classification_metrics(confusion)
+        metrics.update({
+            "latency_ms": {
+                "mean": busy_seconds / len(latencies) * 1000 if latencies else 0.0,
+                "p50": percentile(latencies, 0.50) * 1000,
+                "p99": percentile(latencies, 0.99) * 1000,
+            },
+            "throughput_per_sec": len(latencies) / busy_seconds if busy_seconds else 0.0,
         })
-    return results
+        report[name] = metrics
+        METRICS.inc("emails_analyzed_total", len(rows), prompt=name)
+    
+    return {"emails": len(rows), "workers": workers, "wall_seconds": wall_seconds, "variants": report}
+
+def ab_report_lines(evaluation: Dict) -> List[str]:
+    """Console lines for run_ab_evaluation() output."""
+    lines = [
+        "="*60,
+        "PROMPT A/B EVALUATION",
+        "="*60,
+        f"Emails: {evaluation['emails']}  Workers: {evaluation['workers']}  "
+        f"Wall time: {evaluation['wall_seconds']:.3f}s",
+    ]
+    for name, metrics in evaluation["variants"].items():
+        latency = metrics["latency_ms"]
+        lines += [
+            "",
+            "-"*60,
+            f"Variant {name}: accuracy {metrics['accuracy']:.1%}",
+            "-"*60,
+            f"  Latency: mean {latency['mean']:.4f} ms, p50 {latency['p50']:.4f} ms, "
+            f"p99 {latency['p99']:.4f} ms",
+            f"  Throughput: {metrics['throughput_per_sec']:,.0f} emails/sec",
+            f"  {'class':<10} {'precision':>9} {'recall':>7} {'f1':>6} {'support':>8}",
+        ]
+        for cls, stats in metrics["per_class"].items():
+            lines.append(f"  {cls:<10} {stats['precision']:>9.2f} {stats['recall']:>7.2f} "
+                         f"{stats['f1']:>6.2f} {stats['support']:>8}")
+        
+        classes = metrics["confusion_matrix"]["classes"]
+        lines.append("  Confusion (rows = true, columns = predicted):")
+        lines.append("  " + " " * 10 + "".join(f"{cls:>10}" for cls in classes))
+        for cls, row in zip(classes, metrics["confusion_matrix"]["matrix"]):
+            lines.append(f"  {cls:<10}" + "".join(f"{count:>10}" for count in row))
+    return lines
+
+def results_v1_lines(results: List[Dict]) -> List[str]:
+    """Console lines for Prompt V1 results."""
+    lines = ["", "="*60, "PROMPT V1 RESULTS (Basic)", "="*60]
+    for result in results:
+        lines.append("")
+        lines.append(f"Email {result['id']}: {result['subject']}")
+        lines.append(f"  Sentiment: {result['output']}")
+    return lines
+
+def results_v2_lines(results: List[Dict]) -> List[str]:
+    """Console lines for Prompt V2 results."""
+    lines = ["", "="*60, "PROMPT V2 RESULTS (Structured)", "="*60]
+    for result in results:
+        output = result['output']
+        lines.append("")
+        lines.append(f"Email {result['id']}: {result['subject']}")
+        lines.append(f"  Sentiment: {output['sentiment']}")
+        lines.append(f"  Confidence: {output['confidence']:.1%}")
+        lines.append(f"  Reasoning: {output['reasoning']}")
+    return lines
 
 def print_results_v1(results: List[Dict]):
     """Print results for Prompt V1."""
-    print("\n" + "="*60)
-    print("PROMPT V1 RESULTS (Basic)")
-    print("="*60)
-    for result in results:
-        print(f"\nEmail {result['id']}: {result['subject']}")
-        print(f"  Sentiment: {result['output']}")
+    write_lines(results_v1_lines(results))
 
 def print_results_v2(results: List[Dict]):
     """Print results for Prompt V2."""
-    print("\n" + "="*60)
-    print("PROMPT V2 RESULTS (Structured)")
-    print("="*60)
-    for result in results:
-        output = result['output']
-        print(f"\nEmail {result['id']}: {result['subject']}")
-        print(f"  Sentiment: {output['sentiment']}")
-        print(f"  Confidence: {output['confidence']:.1%}")
-        print(f"  Reasoning: {output['reasoning']}")
+    write_lines(results_v2_lines(results))
 
-def compare_prompts():
-    """Compare both prompt versions."""
-    print("="*60)
-    print("Part B — Sentiment Analysis Prompt Evaluation")
-    print("="*60)
-    
-    print("\n" + "-"*60)
-    print("PROMPT V1 (Basic)")
-    print("-"*60)
-    print(PROMPT_V1)
-    
-    print("\n" + "-"*60)
-    print("PROMPT V2 (Structured)")
-    print("-"*60)
-    print(PROMPT_V2)
-    
-    # Evaluate both
-    results_v1 = evaluate_prompt_v1()
-    results_v2 = evaluate_prompt_v2()
-    
-    # Print results
-    print_results_v1(results_v1)
-    print_results_v2(results_v2)
+def run_comparison(backend=None) -> Dict[str, List[Dict]]:
+    """
+    Evaluate both prompt versions without any output: over shared features,
+    or through a model backend (closed afterwards) when one is given.
+    """
+    if backend is None:
+        return evaluate_prompts()
+    return run_and_close(backend, evaluate_prompts_async(backend))
+
+def report_console(comparison: Dict[str, List[Dict]], quiet: bool = False):
+    """Console report for run_comparison() output; quiet skips prompts and per-email results."""
+    lines = [
+        "="*60,
+        "Part B — Sentiment Analysis Prompt Evaluation",
+        "="*60,
+    ]
+    if not quiet:
+        lines += ["", "-"*60, "PROMPT V1 (Basic)", "-"*60, PROMPT_V1]
+        lines += ["", "-"*60, "PROMPT V2 (Structured)", "-"*60, PROMPT_V2]
+        lines += results_v1_lines(comparison["v1"])
+        lines += results_v2_lines(comparison["v2"])
     
     # Comparison
-    print("\n" + "="*60)
-    print("COMPARISON")
-    print("="*60)
-    print("\nV1 Characteristics:")
-    print("  - Simple, unstructured output")
-    print("  - No confidence scores")
-    print("  - No reasoning provided")
-    
-    print("\nV2 Improvements:")
-    print("  - Structured JSON output")
-    print("  - Confidence scores for each prediction")
-    print("  - Reasoning helps with debugging")
-    print("  - Context-specific rules")
-    
-    print("\n" + "="*60)
-    print("Evaluation Complete")
-    print("="*60)
+    lines += [
+        "",
+        "="*60,
+        "COMPARISON",
+        "="*60,
+        "",
+        "V1 Characteristics:",
+        "  - Simple, unstructured output",
+        "  - No confidence scores",
+        "  - No reasoning provided",
+        "",
+        "V2 Improvements:",
+        "  - Structured JSON output",
+        "  - Confidence scores for each prediction",
+        "  - Reasoning helps with debugging",
+        "  - Context-specific rules",
+        "",
+        "="*60,
+        "Evaluation Complete",
+        "="*60,
+    ]
+    write_lines(lines)
+
+CSV_FIELDS = ["id", "subject", "prompt", "sentiment", "confidence", "reasoning"]
+
+def report_csv(comparison: Dict[str, List[Dict]]):
+    """One CSV row per (email, prompt version)."""
+    rows = [{"id": r["id"], "subject": r["subject"], "prompt": "v1", "sentiment": r["output"]}
+            for r in comparison["v1"]]
+    rows += [{"id": r["id"], "subject": r["subject"], "prompt": "v2", **r["output"]}
+             for r in comparison["v2"]]
+    write_csv(rows, CSV_FIELDS)
+
+def compare_prompts():
+    """Compare both prompt versions."""
+    report_console(run_comparison())
 
-def main():
+def main(argv: Optional[List[str]] = None):
     """Main execution function."""
-    compare_prompts()
+    parser = argparse.ArgumentParser(description="Part B — Sentiment Analysis Prompt Evaluation")
+    parser.add_argument("--ab", action="store_true",
+                        help="run the labeled A/B harness over every registered prompt variant")
+    parser.add_argument("--corpus", metavar="PATH",
+                        help="--ab: labeled JSONL corpus (default: the built-in labeled test emails)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="--ab: evaluate corpus chunks over this many processes")
+    add_model_arguments(parser)
+    add_output_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    enable_from_args(args)
+    if args.ab and (args.model_url or args.response_cache):
+        parser.error("--ab times the local prompt analyzers; --model-url and --response-cache do not apply")
+    
+    if args.ab:
+        corpus = load_corpus(args.corpus) if args.corpus else labeled_test_emails()
+        evaluation = run_ab_evaluation(corpus, workers=args.workers)
+        if args.format == "json":
+            write_json(evaluation)
+        elif args.format == "csv":
+            write_csv(({"variant": name, "accuracy": m["accuracy"],
+                        "mean_latency_ms": m["latency_ms"]["mean"],
+                        "p99_latency_ms": m["latency_ms"]["p99"],
+                        "throughput_per_sec": m["throughput_per_sec"]}
+                       for name, m in evaluation["variants"].items()),
+                      ["variant", "accuracy", "mean_latency_ms", "p99_latency_ms", "throughput_per_sec"])
+        else:
+            write_lines(ab_report_lines(evaluation))
+        export_metrics(args)
+        return
+    
+    backend = backend_from_args(args)
+    comparison = run_comparison(backend)
+    report_cache_stats(backend)
+    if args.format == "json":
+        write_json({"prompts": {"v1": PROMPT_V1, "v2": PROMPT_V2}, "results": comparison})
+    elif args.format == "csv":
+        report_csv(comparison)
+    else:
+        report_console(comparison, quiet=args.quiet)
+    export_metrics(args)
 
 if __name__ == "__main__":
     main()
-
@@ -6,8 +6,31 @@ Standalone script for RAG system with retrieval and generation.
 Run: python part_c_rag_system.py
 """
 
+import argparse
+import asyncio
+import hashlib
+import heapq
+import itertools
 import json
-from typing import Dict, List, Tuple
+import math
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from collections import Counter, OrderedDict, defaultdict
+from functools import lru_cache
+from operator import itemgetter, mul
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple
+
+from instrumentation import METRICS, add_metrics_arguments, enable_from_args, export_metrics
+from llm_backend import add_model_arguments, backend_from_args, report_cache_stats, run_and_close
+from reporting import add_output_arguments, write_csv, write_json, write_lines
 
 # Knowledge Base Articles
 KB_ARTICLES = [
@@ -49,14 +72,22 @@ KB_ARTICLES = [
     }
 ]
 
+def tokenize(text: str) -> Set[str]:
+    """Split text into the lowercase word set used for Jaccard matching."""
+    return set(w.lower() for w in text.split() if len(w) > 2)
+
+def article_text(article: Dict) -> str:
+    """Combine article title, content and tags into one searchable string."""
+    return f"{article['title']} {article['content']} {' '.join(article['tags'])}"
+
 def calculate_similarity(text1: str, text2: str) -> float:
     """
     Calculate Jaccard similarity between two texts.
     This is a mock embedding - in production, use proper embeddings.
     """
     # Tokenize and create sets
-    words1 = set(w.lower() for w in text1.split() if len(w) > 2)
-    words2 = set(w.lower() for w in text2.split() if len(w) > 2)
+    words1 = tokenize(text1)
+    words2 = tokenize(text2)
     
     # Jaccard similarity
     intersection = len(words1 & words2)
@@ -64,29 +95,1306 @@ def calculate_similarity(text1: str, text2: str) -> float:
     
     return intersection / union if union > 0 else 0.0
 
-def retrieve_articles(query: str, top_k: int = 2, threshold: float = 0.1) -> List[Tuple[Dict, float]]:
+# On-disk index format (little-endian, sections 8-byte aligned):
+# header, section table, then vocabulary blob + offsets (terms sorted by
+# UTF-8 bytes), CSR postings (term offsets, doc ids, term freqs),
+# doc lengths, doc norms, and article JSON blob + offsets. Dense indexes
+# leave the term sections empty and fill the float32 vector and centroid
+# rows (dim wide) and the CSR IVF lists (list offsets, doc ids) instead.
+INDEX_MAGIC = b"KBIX"
+INDEX_FORMAT_VERSION = 2
+_INDEX_HEADER = struct.Struct("<4sH2x8sIIQddII32s")
+_INDEX_SECTIONS = ("vocab", "vocab_offsets", "posting_offsets", "posting_docs",
+                   "posting_freqs", "doc_lengths", "doc_norms", "article_offsets",
+                   "articles", "vectors", "centroids", "list_offsets", "list_docs")
+_INDEX_TABLE = struct.Struct(f"<{2 * len(_INDEX_SECTIONS)}Q")
+
+class StaleIndexError(ValueError):
+    """Raised when an on-disk index was built from a different KB or in an older format."""
+
+class CorruptIndexError(StaleIndexError):
+    """Raised when an on-disk index is truncated or damaged (rebuilt like a stale one)."""
+
+def kb_checksum(articles: List[Dict]) -> bytes:
+    """SHA-256 over the canonical JSON of the KB source articles."""
+    digest = hashlib.sha256()
+    for article in articles:
+        digest.update(json.dumps(article, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.digest()
+
+class _Slices:
+    """Sequence view splitting one flat array into rows by an offsets array."""
+
+    def __init__(self, values, offsets):
+        self.values = values
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int):
+        return self.values[self.offsets[row]:self.offsets[row + 1]]
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+class _Rows:
+    """Sequence view splitting one flat array into rows of equal width."""
+
+    def __init__(self, values, width: int):
+        self.values = values
+        self.width = width
+
+    def __len__(self) -> int:
+        return len(self.values) // self.width if self.width else 0
+
+    def __getitem__(self, row: int):
+        return self.values[row * self.width:(row + 1) * self.width]
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+class _MappedVocab:
+    """Read-only term -> term id lookup by binary search over a sorted mapped vocabulary."""
+
+    def __init__(self, terms: _Slices):
+        self.terms = terms
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __contains__(self, term: str) -> bool:
+        return self.get(term) is not None
+
+    def get(self, term: str, default=None):
+        key = term.encode("utf-8")
+        lo, hi = 0, len(self.terms)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.terms[mid].tobytes() < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self.terms) and self.terms[lo].tobytes() == key:
+            return lo
+        return default
+
+    def items(self):
+        for term_id in range(len(self.terms)):
+            yield self.terms[term_id].tobytes().decode("utf-8"), term_id
+
+class _MappedPostings:
+    """Read-only term -> posting doc ids mapping over a mapped index."""
+
+    def __init__(self, vocab: _MappedVocab, docs: _Slices):
+        self.vocab = vocab
+        self.docs = docs
+
+    def __len__(self) -> int:
+        return len(self.vocab)
+
+    def get(self, term: str, default=None):
+        term_id = self.vocab.get(term)
+        return default if term_id is None else self.docs[term_id]
+
+    def items(self):
+        for term, term_id in self.vocab.items():
+            yield term, self.docs[term_id]
+
+class _MappedArticles:
+    """Lazily decoded article dicts from a mapped index file."""
+
+    def __init__(self, blobs: _Slices):
+        self.blobs = blobs
+        self._decoded: Dict[int, Dict] = {}
+
+    def __len__(self) -> int:
+        return len(self.blobs)
+
+    def __getitem__(self, doc_id: int) -> Dict:
+        article = self._decoded.get(doc_id)
+        if article is None:
+            article = self._decoded[doc_id] = json.loads(self.blobs[doc_id].tobytes())
+        return article
+
+    def __iter__(self):
+        return (self[doc_id] for doc_id in range(len(self)))
+
+def write_index_file(path: str, backend: str, articles, postings=(),
+                     doc_lengths=(), doc_norms=(), k1: float = 0.0, b: float = 0.0,
+                     vectors=(), centroids=(), lists=(), dim: int = 0, trained_size: int = 0):
     """
-    Retrieve relevant articles using similarity search.
-    Returns: List of (article, score) tuples
+    Serialize an index to a versioned binary file.
+    postings: iterable of (term, doc ids, term freqs or None) per term
+    vectors, centroids: dim-wide float32 rows; lists: doc ids per IVF list
     """
-    scored_articles = []
+    vocab = bytearray()
+    vocab_offsets = array("q", [0])
+    posting_offsets = array("q", [0])
+    posting_docs = array("i")
+    posting_freqs = array("i")
+    for term, docs, freqs in sorted(postings, key=lambda x: x[0].encode("utf-8")):
+        vocab += term.encode("utf-8")
+        vocab_offsets.append(len(vocab))
+        posting_docs.extend(docs)
+        posting_freqs.extend(freqs if freqs is not None else [1] * len(docs))
+        posting_offsets.append(len(posting_docs))
     
-    for article in KB_ARTICLES:
-        # Combine article text for matching
-        article_text = f"{article['title']} {article['content']} {' '.join(article['tags'])}"
+    blob = bytearray()
+    article_offsets = array("q", [0])
+    for article in articles:
+        blob += json.dumps(article, ensure_ascii=False).encode("utf-8")
+        article_offsets.append(len(blob))
+    
+    list_offsets = array("q", [0])
+    list_docs = array("i")
+    for docs in lists:
+        list_docs.extend(docs)
+        list_offsets.append(len(list_docs))
+    flat_vectors = array("f")
+    for vector in vectors:
+        flat_vectors.extend(vector)
+    flat_centroids = array("f")
+    for centroid in centroids:
+        flat_centroids.extend(centroid)
+    
+    sections = [bytes(vocab), vocab_offsets, posting_offsets, posting_docs, posting_freqs,
+                array("i", doc_lengths), array("d", doc_norms), article_offsets, bytes(blob),
+                flat_vectors, flat_centroids, list_offsets, list_docs]
+    if sys.byteorder != "little":
+        for section in sections:
+            if isinstance(section, array):
+                section.byteswap()
+    
+    header = _INDEX_HEADER.pack(
+        INDEX_MAGIC, INDEX_FORMAT_VERSION, backend.encode("ascii"),
+        len(article_offsets) - 1, len(vocab_offsets) - 1, len(posting_docs),
+        k1, b, dim, trained_size, kb_checksum(articles)
+    )
+    
+    # Lay sections out after the header and table, each 8-byte aligned
+    table = []
+    position = _INDEX_HEADER.size + _INDEX_TABLE.size
+    for section in sections:
+        position += -position % 8
+        size = len(section) * (section.itemsize if isinstance(section, array) else 1)
+        table += [position, size]
+        position += size
+    
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(_INDEX_TABLE.pack(*table))
+        for offset, section in zip(table[::2], sections):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(section.tobytes() if isinstance(section, array) else section)
+    os.replace(tmp_path, path)
+
+def read_index_file(path: str, backend: str, articles: Optional[List[Dict]] = None) -> Dict:
+    """
+    Memory-map an index file written by write_index_file.
+    Arrays are zero-copy views into the shared page cache. If articles are
+    given, the file's checksum must match them (StaleIndexError otherwise)
+    and they are used in place of the stored copies. A truncated file, or
+    one whose sections fall outside it, raises CorruptIndexError.
+    """
+    if sys.byteorder != "little":
+        raise ValueError("Memory-mapped KB indexes require a little-endian host")
+    
+    with open(path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if file_size < len(INDEX_MAGIC) + 2:
+            raise CorruptIndexError(f"{path} is truncated ({file_size} bytes); rebuild it")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    
+    if view[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+        raise ValueError(f"{path} is not a KB index file")
+    version = struct.unpack_from("<H", view, len(INDEX_MAGIC))[0]
+    if version != INDEX_FORMAT_VERSION:
+        raise StaleIndexError(f"{path} has index format v{version}, expected v{INDEX_FORMAT_VERSION}; rebuild it")
+    if file_size < _INDEX_HEADER.size + _INDEX_TABLE.size:
+        raise CorruptIndexError(f"{path} is truncated ({file_size} bytes); rebuild it")
+    _, _, stored_backend, num_docs, num_terms, num_postings, k1, b, dim, trained_size, checksum = \
+        _INDEX_HEADER.unpack_from(view)
+    stored_backend = stored_backend.rstrip(b"\0").decode("ascii")
+    if stored_backend != backend:
+        raise ValueError(f"{path} holds a {stored_backend!r} index, not {backend!r}")
+    if articles is not None and kb_checksum(articles) != checksum:
+        raise StaleIndexError(f"{path} was built from a different KB; rebuild it")
+    
+    table = _INDEX_TABLE.unpack_from(view, _INDEX_HEADER.size)
+    formats = {"vocab": "B", "articles": "B", "doc_norms": "d", "vectors": "f", "centroids": "f",
+               "vocab_offsets": "q", "posting_offsets": "q", "article_offsets": "q", "list_offsets": "q"}
+    sections = {}
+    for name, offset, size in zip(_INDEX_SECTIONS, table[::2], table[1::2]):
+        section_format = formats.get(name, "i")
+        if offset + size > file_size or size % struct.calcsize(section_format):
+            raise CorruptIndexError(f"{path} is damaged (section {name} out of bounds); rebuild it")
+        sections[name] = view[offset:offset + size].cast(section_format)
+    if len(sections["article_offsets"]) != num_docs + 1:
+        raise CorruptIndexError(f"{path} is damaged (article table does not match the header); rebuild it")
+    
+    return {
+        "mmap": mapped,
+        "k1": k1,
+        "b": b,
+        "vocab": _MappedVocab(_Slices(sections["vocab"], sections["vocab_offsets"])),
+        "posting_docs": _Slices(sections["posting_docs"], sections["posting_offsets"]),
+        "posting_freqs": _Slices(sections["posting_freqs"], sections["posting_offsets"]),
+        "doc_lengths": sections["doc_lengths"],
+        "doc_norms": sections["doc_norms"],
+        "dim": dim,
+        "trained_size": trained_size,
+        "vectors": _Rows(sections["vectors"], dim),
+        "centroids": _Rows(sections["centroids"], dim),
+        "lists": _Slices(sections["list_docs"], sections["list_offsets"]),
+        "articles": (list(articles) if articles is not None else
+                     _MappedArticles(_Slices(sections["articles"], sections["article_offsets"]))),
+    }
+
+# Index versions are drawn from one counter, so a version also identifies
+# the index instance (a rebuilt index never reuses an old version)
+_INDEX_VERSIONS = itertools.count(1)
+
+class IncrementalIndex:
+    """
+    Add/update/remove support shared by the retrieval indexes.
+    Removed and replaced articles are tombstoned and skipped at query time;
+    once tombstones exceed compact_ratio of all slots, a background thread
+    rebuilds the index from the live articles and swaps it in. Updates
+    made during the rebuild are logged and replayed onto the new index
+    before the swap, so compaction keeps up with steady update traffic.
+    One lock serializes updates against queries, so every query sees the
+    index either entirely before or entirely after a given update.
+    A replacement article keeps its predecessor's KB position (kb_order),
+    so ties still rank in KB order and compaction restores KB order.
+    """
+
+    compact_ratio = 0.25
+
+    # Attributes an index keeps when compaction swaps in the rebuilt state
+    _COMPACTION_KEEPS = ("_lock", "_compact_lock", "_compacting", "_update_log", "version")
+
+    def _init_updates(self):
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._compacting = False
+        # (operation, argument) per update since the running compaction's snapshot
+        self._update_log: Optional[List[Tuple[str, object]]] = None
+        self.version = next(_INDEX_VERSIONS)
+        self.deleted: Set[int] = set()
+        self.doc_ids: Optional[Dict[str, int]] = None
+        # KB position per doc id; None while they coincide (no update yet)
+        self.kb_order: Optional[List[int]] = None
+
+    def __len__(self) -> int:
+        """Number of live (non-tombstoned) articles."""
+        return len(self.articles) - len(self.deleted)
+
+    def add_article(self, article: Dict):
+        """Index a new article; its id must not be indexed yet."""
+        with self._lock:
+            self._apply("add", article)
+            self._changed()
+
+    def update_article(self, article: Dict):
+        """Replace the indexed article with the same id."""
+        with self._lock:
+            self._apply("update", article)
+            self._changed()
+
+    def remove_article(self, article_id: str):
+        """Drop an article from search results."""
+        with self._lock:
+            self._apply("remove", article_id)
+            self._changed()
+
+    def compact(self):
+        """
+        Rebuild the index without tombstones and swap it in. The rebuild
+        runs without the lock; updates that land meanwhile are replayed
+        onto the rebuilt index before the swap.
+        """
+        with self._compact_lock:
+            with self._lock:
+                live = self._live_articles()
+                self._update_log = []
+            try:
+                # The expensive rebuild runs without the lock; queries and updates keep flowing
+                fresh = self._rebuild(live)
+                with self._lock:
+                    for operation, argument in self._update_log:
+                        fresh._apply(operation, argument)
+                    self._update_log = None
+                    self._swap_in(fresh)
+            finally:
+                self._update_log = None
+
+    def search(self, query: str, top_k: int = 2, threshold: float = 0.1) -> List[Tuple[Dict, float]]:
+        """
+        Return up to top_k (article, score) tuples scoring above threshold,
+        best first, ties broken by KB order.
+        """
+        return self.search_batch([query], top_k, threshold)[0]
+
+    def search_batch(self, queries: List[str], top_k: int = 2,
+                     threshold: float = 0.1) -> List[List[Tuple[Dict, float]]]:
+        """Batched search(): one result list per query, in input order."""
+        with self._lock:
+            scores_batch = self.score_batch(queries)
+            if METRICS.enabled:
+                METRICS.inc("articles_scored_total", sum(map(len, scores_batch)), index=type(self).__name__)
+            return [self.rank(scores, top_k, threshold) for scores in scores_batch]
+
+    def score(self, query: str) -> Dict[int, float]:
+        """Score one query; see score_batch."""
+        return self.score_batch([query])[0]
+
+    def rank(self, scores: Dict[int, float], top_k: int, threshold: float) -> List[Tuple[Dict, float]]:
+        """Turn sparse scores into the top_k (article, score) tuples above threshold."""
+        candidates = [(doc_id, score) for doc_id, score in scores.items() if score > threshold]
         
-        # Calculate similarity
-        score = calculate_similarity(query, article_text)
+        # Partial selection instead of sorting every candidate
+        top = heapq.nsmallest(top_k, candidates, key=self._rank_key())
+        return [(self.articles[doc_id], score) for doc_id, score in top]
+
+    def _apply(self, operation: str, argument):
+        """Apply one add/update/remove (lock held), logging it for a running compaction."""
+        if operation == "add":
+            if argument["id"] in self._doc_id_map():
+                raise ValueError(f"Article {argument['id']!r} is already indexed")
+            self._append(argument)
+        elif operation == "update":
+            doc_id = self._live_doc(argument["id"])
+            position = self._kb_position(doc_id)
+            self._tombstone(doc_id)
+            self._append(argument, position)
+        else:
+            self._tombstone(self._live_doc(argument))
+            del self.doc_ids[argument]
+        if self._update_log is not None:
+            self._update_log.append((operation, argument))
+
+    def _live_articles(self) -> List[Dict]:
+        """Live articles in KB order."""
+        live_ids = sorted((doc_id for doc_id in range(len(self.articles)) if doc_id not in self.deleted),
+                          key=self._kb_position)
+        return [self.articles[doc_id] for doc_id in live_ids]
+
+    def _swap_in(self, fresh: "IncrementalIndex"):
+        for name, value in vars(fresh).items():
+            if name not in self._COMPACTION_KEEPS:
+                setattr(self, name, value)
+
+    def _compact_for_save(self):
+        """
+        Rebuild under the lock if updates landed during save()'s compaction,
+        so the file holds exactly the live KB in KB order (matching checksum).
+        """
+        if self.deleted:
+            self._swap_in(self._rebuild(self._live_articles()))
+
+    def _doc_id_map(self) -> Dict[str, int]:
+        # Built on first update so read-only (memory-mapped) use never decodes every article
+        if self.doc_ids is None:
+            self.doc_ids = {article["id"]: doc_id for doc_id, article in enumerate(self.articles)
+                            if doc_id not in self.deleted}
+        return self.doc_ids
+
+    def _live_doc(self, article_id: str) -> int:
+        doc_id = self._doc_id_map().get(article_id)
+        if doc_id is None:
+            raise KeyError(f"Article {article_id!r} is not indexed")
+        return doc_id
+
+    def _kb_position(self, doc_id: int) -> int:
+        return doc_id if self.kb_order is None else self.kb_order[doc_id]
+
+    def _rank_key(self):
+        """Sort key for (doc_id, score) pairs: best score first, ties in KB order."""
+        order = self.kb_order
+        if order is None:
+            return lambda x: (-x[1], x[0])
+        return lambda x: (-x[1], order[x[0]])
+
+    def _append(self, article: Dict, position: Optional[int] = None):
+        self._thaw()
+        doc_id = len(self.articles)
+        if position is not None and self.kb_order is None:
+            self.kb_order = list(range(doc_id))
+            self._next_position = doc_id
+        if self.kb_order is not None:
+            # New articles go to the end of the KB; replacements keep their slot
+            if position is None:
+                position = self._next_position
+                self._next_position += 1
+            self.kb_order.append(position)
+        self.articles.append(article)
+        self.doc_ids[article["id"]] = doc_id
+        self._index_article(doc_id, article)
+
+    def _tombstone(self, doc_id: int):
+        self._thaw()
+        self._unindex_article(doc_id)
+        self.deleted.add(doc_id)
+
+    def _needs_compaction(self) -> bool:
+        return len(self.deleted) > self.compact_ratio * len(self.articles)
+
+    def _changed(self):
+        self.version = next(_INDEX_VERSIONS)
+        if self._compacting or not self._needs_compaction():
+            return
+        self._compacting = True
+        threading.Thread(target=self._background_compact, daemon=True).start()
+
+    def _background_compact(self):
+        try:
+            # Tombstones replayed from the log trigger the next compaction on a later update
+            self.compact()
+        finally:
+            self._compacting = False
+
+    def _thaw(self):
+        """Copy a memory-mapped index into mutable in-memory structures."""
+        if getattr(self, "_mmap", None) is None:
+            return
+        self._materialize()
+        self._mmap = None
+
+class KBIndex(IncrementalIndex):
+    """
+    Inverted index over KB articles for Jaccard retrieval.
+    Built once: articles are tokenized up front, so a query only
+    touches the articles that share at least one term with it.
+    """
+
+    def __init__(self, articles: List[Dict]):
+        self.articles = list(articles)
+        self.term_sets: List[Set[str]] = []
+        self.set_sizes: List[int] = []
+        self.postings: Dict[str, List[int]] = defaultdict(list)
         
-        scored_articles.append((article, score))
+        for doc_id, article in enumerate(self.articles):
+            self._index_article(doc_id, article)
+        self._init_updates()
+
+    def _index_article(self, doc_id: int, article: Dict):
+        terms = tokenize(article_text(article))
+        self.term_sets.append(terms)
+        self.set_sizes.append(len(terms))
+        for term in terms:
+            self.postings[term].append(doc_id)
+
+    def _unindex_article(self, doc_id: int):
+        # Jaccard keeps no collection statistics; the tombstone is enough
+        pass
+
+    def _rebuild(self, articles: List[Dict]) -> "KBIndex":
+        return KBIndex(articles)
+
+    def _materialize(self):
+        self.articles = list(self.articles)
+        self.term_sets = [self.term_sets[doc_id] for doc_id in range(len(self.articles))]
+        self.set_sizes = list(self.set_sizes)
+        self.postings = defaultdict(list, ((term, list(docs)) for term, docs in self.postings.items()))
+
+    def save(self, path: str):
+        """
+        Write the index to a binary file for fast memory-mapped loading.
+        Pending tombstones are compacted away first, restoring KB order
+        (so the checksum matches the KB the index came from).
+        """
+        if self.deleted:
+            self.compact()
+        with self._lock:
+            self._compact_for_save()
+            write_index_file(path, "jaccard", self.articles,
+                             ((term, docs, None) for term, docs in self.postings.items()),
+                             self.set_sizes)
+
+    @classmethod
+    def load(cls, path: str, articles: Optional[List[Dict]] = None) -> "KBIndex":
+        """Open a saved index via mmap; see read_index_file for the checksum check."""
+        data = read_index_file(path, "jaccard", articles)
+        index = cls.__new__(cls)
+        index._mmap = data["mmap"]
+        index.articles = data["articles"]
+        index.set_sizes = data["doc_lengths"]
+        index.postings = _MappedPostings(data["vocab"], data["posting_docs"])
+        index.term_sets = _LazyTermSets(index.articles)
+        index._init_updates()
+        return index
+
+    def score_batch(self, queries: List[str]) -> List[Dict[int, float]]:
+        """
+        Jaccard score for every article sharing a term with each query;
+        articles missing from a result score 0.0.
+        Scored in one shared pass over the postings: each distinct query
+        term is looked up once for the whole batch, and queries with
+        identical term sets are scored once.
+        """
+        with self._lock:
+            return self._score_batch(queries)
+
+    def _score_batch(self, queries: List[str]) -> List[Dict[int, float]]:
+        query_sets = [frozenset(tokenize(query)) for query in queries]
+        unique_sets = list(dict.fromkeys(query_sets))
+        
+        # Route each distinct term to the queries that contain it
+        term_queries: Dict[str, List[int]] = defaultdict(list)
+        for slot, terms in enumerate(unique_sets):
+            for term in terms:
+                term_queries[term].append(slot)
+        
+        # Count overlapping terms per (query, candidate article)
+        overlaps: List[Dict[int, int]] = [defaultdict(int) for _ in unique_sets]
+        for term, slots in term_queries.items():
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            for slot in slots:
+                overlap = overlaps[slot]
+                for doc_id in docs:
+                    overlap[doc_id] += 1
+        
+        # |A ∪ B| = |A| + |B| - |A ∩ B|
+        set_sizes = self.set_sizes
+        deleted = self.deleted
+        unique_scores = {}
+        for terms, overlap in zip(unique_sets, overlaps):
+            query_size = len(terms)
+            unique_scores[terms] = {
+                doc_id: inter / (query_size + set_sizes[doc_id] - inter)
+                for doc_id, inter in overlap.items() if doc_id not in deleted
+            }
+        return [unique_scores[terms] for terms in query_sets]
+
+    def rank(self, scores: Dict[int, float], top_k: int, threshold: float) -> List[Tuple[Dict, float]]:
+        """Turn sparse scores into the top_k (article, score) tuples above threshold."""
+        ranked = sorted(scores.items(), key=self._rank_key())
+        
+        # Non-matching articles score 0.0 and only pass a negative threshold
+        if threshold < 0:
+            ranked.extend(sorted(((doc_id, 0.0) for doc_id in range(len(self.articles))
+                                  if doc_id not in scores and doc_id not in self.deleted),
+                                 key=self._rank_key()))
+        
+        return [(self.articles[doc_id], score)
+                for doc_id, score in ranked if score > threshold][:top_k]
+
+class _LazyTermSets:
+    """Per-article Jaccard term sets, tokenized on first access."""
+
+    def __init__(self, articles):
+        self.articles = articles
+        self._sets: Dict[int, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.articles)
+
+    def __getitem__(self, doc_id: int) -> Set[str]:
+        terms = self._sets.get(doc_id)
+        if terms is None:
+            terms = self._sets[doc_id] = tokenize(article_text(self.articles[doc_id]))
+        return terms
+
+# Lightweight analyzer for the BM25 backend: punctuation-free words,
+# common English stopwords dropped, simple plural folding
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset([
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "how", "i", "if", "in", "is", "it", "my", "no", "not", "of", "on",
+    "or", "our", "the", "this", "to", "we", "what", "when", "where", "which",
+    "why", "with", "you", "your"
+])
+
+def analyze(text: str) -> List[str]:
+    """Split text into normalized BM25 terms (duplicates kept)."""
+    terms = []
+    for word in WORD_PATTERN.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+class BM25Index(IncrementalIndex):
+    """
+    Okapi BM25 index over KB articles.
+    The document-term matrix is stored column-wise (one posting array of
+    doc ids and term frequencies per term), so scoring a query is a single
+    sparse matrix-vector product over the query's postings only.
+    """
+
+    def __init__(self, articles: List[Dict], k1: float = 1.2, b: float = 0.75):
+        self.articles = list(articles)
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+        self.posting_docs: List[array] = []
+        self.posting_freqs: List[array] = []
+        self.doc_lengths = array("i")
+        self.total_length = 0
+        
+        # Postings of tombstoned articles per term, excluded from document frequency
+        self.dead_freqs: Dict[int, int] = defaultdict(int)
+        
+        for doc_id, article in enumerate(self.articles):
+            self._index_article(doc_id, article)
+        self._refresh_norms()
+        self._init_updates()
+
+    def _index_article(self, doc_id: int, article: Dict):
+        terms = analyze(article_text(article))
+        self.doc_lengths.append(len(terms))
+        self.total_length += len(terms)
+        for term, freq in Counter(terms).items():
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                term_id = self.vocab[term] = len(self.posting_docs)
+                self.posting_docs.append(array("i"))
+                self.posting_freqs.append(array("i"))
+            self.posting_docs[term_id].append(doc_id)
+            self.posting_freqs[term_id].append(freq)
+        self.doc_norms = None
+
+    def _unindex_article(self, doc_id: int):
+        for term in set(analyze(article_text(self.articles[doc_id]))):
+            self.dead_freqs[self.vocab[term]] += 1
+        self.total_length -= self.doc_lengths[doc_id]
+        self.doc_norms = None
+
+    def _refresh_norms(self):
+        """Per-document length norm: k1 * (1 - b + b * |d| / avgdl), over live articles."""
+        k1, b = self.k1, self.b
+        num_live = len(self.doc_lengths) - len(getattr(self, "deleted", ()))
+        avgdl = (self.total_length / num_live) if num_live else 0.0
+        self.doc_norms = array("d", (
+            k1 * (1 - b + b * length / avgdl) if avgdl else k1
+            for length in self.doc_lengths
+        ))
+
+    def _rebuild(self, articles: List[Dict]) -> "BM25Index":
+        return BM25Index(articles, self.k1, self.b)
+
+    def _materialize(self):
+        self.articles = list(self.articles)
+        self.vocab = dict(self.vocab.items())
+        self.posting_docs = [array("i", docs) for docs in self.posting_docs]
+        self.posting_freqs = [array("i", freqs) for freqs in self.posting_freqs]
+        self.doc_lengths = array("i", self.doc_lengths)
+        self.doc_norms = array("d", self.doc_norms)
+
+    def save(self, path: str):
+        """
+        Write the index to a binary file for fast memory-mapped loading.
+        Pending tombstones are compacted away first, restoring KB order
+        (so the checksum matches the KB the index came from).
+        """
+        if self.deleted:
+            self.compact()
+        with self._lock:
+            self._compact_for_save()
+            if self.doc_norms is None:
+                self._refresh_norms()
+            write_index_file(path, "bm25", self.articles,
+                             ((term, self.posting_docs[term_id], self.posting_freqs[term_id])
+                              for term, term_id in self.vocab.items()),
+                             self.doc_lengths, self.doc_norms, self.k1, self.b)
+
+    @classmethod
+    def load(cls, path: str, articles: Optional[List[Dict]] = None) -> "BM25Index":
+        """Open a saved index via mmap; see read_index_file for the checksum check."""
+        data = read_index_file(path, "bm25", articles)
+        index = cls.__new__(cls)
+        index._mmap = data["mmap"]
+        index.articles = data["articles"]
+        index.k1 = data["k1"]
+        index.b = data["b"]
+        index.vocab = data["vocab"]
+        index.posting_docs = data["posting_docs"]
+        index.posting_freqs = data["posting_freqs"]
+        index.doc_lengths = data["doc_lengths"]
+        index.doc_norms = data["doc_norms"]
+        index.dead_freqs = defaultdict(int)
+        index._init_updates()
+        return index
+
+    def _thaw(self):
+        if getattr(self, "_mmap", None) is not None:
+            self.total_length = sum(self.doc_lengths)
+        super()._thaw()
+
+    def idf(self, doc_freq: int) -> float:
+        """BM25 inverse document frequency over live articles (always positive)."""
+        num_docs = len(self)
+        return math.log(1 + (num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def score_batch(self, queries: List[str]) -> List[Dict[int, float]]:
+        """
+        BM25 score for every article sharing a term with each query,
+        normalized to [0, 1) by the query's maximum attainable score.
+        Scored in one pass: the batch forms a sparse query matrix, and each
+        distinct term's posting array is walked once for every query that
+        uses it. Identical term bags are scored once.
+        """
+        with self._lock:
+            if self.doc_norms is None:
+                self._refresh_norms()
+            return self._score_batch(queries)
+
+    def _score_batch(self, queries: List[str]) -> List[Dict[int, float]]:
+        query_bags = [tuple(sorted(Counter(analyze(query)).items())) for query in queries]
+        unique_bags = list(dict.fromkeys(query_bags))
+        
+        # Query matrix, column-wise: term -> [(query slot, query term freq)]
+        term_queries: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for slot, bag in enumerate(unique_bags):
+            for term, query_freq in bag:
+                term_queries[term].append((slot, query_freq))
+        
+        k1_plus_1 = self.k1 + 1
+        doc_norms = self.doc_norms
+        deleted = self.deleted
+        scores: List[Dict[int, float]] = [defaultdict(float) for _ in unique_bags]
+        max_scores = [0.0] * len(unique_bags)
+        for term, entries in term_queries.items():
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                docs, freqs, doc_freq = (), (), 0
+            else:
+                docs, freqs = self.posting_docs[term_id], self.posting_freqs[term_id]
+                doc_freq = len(docs) - self.dead_freqs.get(term_id, 0)
+            
+            # Term weights per document are shared by every query in the batch
+            idf = self.idf(doc_freq)
+            doc_weights = [(doc_id, idf * freq * k1_plus_1 / (freq + doc_norms[doc_id]))
+                           for doc_id, freq in zip(docs, freqs) if doc_id not in deleted]
+            
+            # Unknown terms still count towards the attainable maximum
+            for slot, query_freq in entries:
+                max_scores[slot] += query_freq * idf * k1_plus_1
+                acc = scores[slot]
+                for doc_id, weight in doc_weights:
+                    acc[doc_id] += query_freq * weight
+        
+        unique_scores = {}
+        for bag, acc, max_score in zip(unique_bags, scores, max_scores):
+            unique_scores[bag] = ({doc_id: score / max_score for doc_id, score in acc.items()}
+                                  if max_score else {})
+        return [unique_scores[bag] for bag in query_bags]
+
+# Dense backend: network-free embeddings by feature hashing
+EMBEDDING_DIM = 256
+
+# Dimensions per article used to assign it to an IVF list
+ASSIGN_DIMS = 32
+
+@lru_cache(maxsize=1 << 16)
+def _feature_hash(feature: str) -> int:
+    # crc32 rather than hash(): stable across processes and PYTHONHASHSEED
+    return zlib.crc32(feature.encode("utf-8"))
+
+def _bucket(hashed: int, weight: float, dim: int) -> Tuple[int, float]:
+    """Map a feature hash to (dimension, signed weight)."""
+    return hashed % dim, (weight if hashed & 0x80000000 else -weight)
+
+@lru_cache(maxsize=1 << 16)
+def _word_buckets(word: str, dim: int) -> Tuple[Tuple[int, float], ...]:
+    """Signed buckets of one word: the word itself plus its character trigrams."""
+    padded = f"<{word}>"
+    buckets = [_bucket(_feature_hash(f"w:{word}"), 1.0, dim)]
+    buckets.extend(_bucket(_feature_hash(f"c:{padded[i:i + 3]}"), 0.25, dim)
+                   for i in range(len(padded) - 2))
+    return tuple(buckets)
+
+def embed(text: str, dim: int = EMBEDDING_DIM) -> array:
+    """
+    Embed text as an L2-normalized float32 vector by feature hashing.
+    Words, their character trigrams (of the word padded with boundary
+    markers) and word bigrams are hashed into dim signed buckets with
+    sublinear 1 + log(tf) weights, so inflections and typos still overlap.
+    """
+    words = analyze(text)
+    vector = [0.0] * dim
+    for word, count in Counter(words).items():
+        scale = 1 + math.log(count)
+        for d, weight in _word_buckets(word, dim):
+            vector[d] += scale * weight
     
-    # Sort by score (descending)
-    scored_articles.sort(key=lambda x: x[1], reverse=True)
+    # Bigram hashes combine the cached word hashes instead of hashing new strings
+    hashes = [_feature_hash(word) for word in words]
+    for pair, count in Counter(zip(hashes, hashes[1:])).items():
+        d, weight = _bucket((pair[0] * 0x9E3779B1 ^ pair[1]) & 0xFFFFFFFF, 0.5, dim)
+        vector[d] += (1 + math.log(count)) * weight
     
-    # Filter by threshold and return top_k
-    relevant = [(article, score) for article, score in scored_articles if score > threshold]
+    norm = math.sqrt(sum(value * value for value in vector))
+    return array("f", [value / norm for value in vector] if norm else vector)
+
+def _nonzero(vector: array, max_dims: Optional[int] = None) -> Tuple[List[int], List[float]]:
+    """Nonzero (dims, values) of a vector; with max_dims, only the largest in magnitude."""
+    dims = [d for d, value in enumerate(vector) if value]
+    if max_dims is not None and len(dims) > max_dims:
+        strongest = sorted(zip(map(abs, vector), range(len(vector))), reverse=True)[:max_dims]
+        dims = sorted(d for _, d in strongest)
+    return dims, [vector[d] for d in dims]
+
+def _dot_with(vector: array):
+    """Dot product against other vectors, touching only this vector's nonzero dims."""
+    dims, values = _nonzero(vector)
+    if not dims:
+        return lambda row: 0.0
+    if len(dims) == 1:
+        value, dim = values[0], dims[0]
+        return lambda row: value * row[dim]
+    pick = itemgetter(*dims)
+    return lambda row: sum(map(mul, values, pick(row)))
+
+class DenseIndex(IncrementalIndex):
+    """
+    Dense retrieval over feature-hashed article embeddings (cosine similarity).
+    Vectors are float32 rows partitioned by an inverted file (IVF): spherical
+    k-means groups articles into nlist lists, and a query only scores the
+    articles in the nprobe lists with the nearest centroids. Raise nprobe
+    for recall, lower it for speed; exact=True scores every article (brute
+    force) and is the reference for recall().
+    """
+
+    def __init__(self, articles: List[Dict], dim: int = EMBEDDING_DIM, nlist: Optional[int] = None,
+                 nprobe: int = 8, exact: bool = False, seed: int = 0):
+        self.articles = list(articles)
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.exact = exact
+        self.seed = seed
+        self.vectors: List[array] = []
+        self.centroids: List[array] = []
+        self.lists: List[array] = []
+        
+        for doc_id, article in enumerate(self.articles):
+            self._index_article(doc_id, article)
+        self._train()
+        self._init_updates()
+
+    def _index_article(self, doc_id: int, article: Dict):
+        vector = embed(article_text(article), self.dim)
+        self.vectors.append(vector)
+        if self.centroids:
+            self.lists[self._nearest(*_nonzero(vector, ASSIGN_DIMS))].append(doc_id)
+
+    def _unindex_article(self, doc_id: int):
+        # Cosine scores keep no collection statistics; the tombstone is enough
+        pass
+
+    def _rebuild(self, articles: List[Dict]) -> "DenseIndex":
+        return DenseIndex(articles, self.dim, self.nlist, self.nprobe, self.exact, self.seed)
+
+    def _materialize(self):
+        self.articles = list(self.articles)
+        self.vectors = [array("f", vector) for vector in self.vectors]
+        self.centroids = [array("f", centroid) for centroid in self.centroids]
+        self.lists = [array("i", docs) for docs in self.lists]
+
+    def save(self, path: str):
+        """
+        Write the vectors, centroids and IVF lists to a binary file, so a
+        large KB is embedded and clustered once rather than on every start.
+        Pending tombstones are compacted away first, restoring KB order
+        (so the checksum matches the KB the index came from).
+        """
+        if self.deleted:
+            self.compact()
+        with self._lock:
+            self._compact_for_save()
+            write_index_file(path, "dense", self.articles, vectors=self.vectors, centroids=self.centroids,
+                             lists=self.lists, dim=self.dim, trained_size=self.trained_size)
+
+    @classmethod
+    def load(cls, path: str, articles: Optional[List[Dict]] = None, nlist: Optional[int] = None,
+             nprobe: int = 8, exact: bool = False, seed: int = 0) -> "DenseIndex":
+        """
+        Open a saved index via mmap; see read_index_file for the checksum check.
+        dim comes from the file; the other settings apply to queries and rebuilds.
+        """
+        data = read_index_file(path, "dense", articles)
+        index = cls.__new__(cls)
+        index._mmap = data["mmap"]
+        index.articles = data["articles"]
+        index.dim = data["dim"]
+        index.nlist = nlist
+        index.nprobe = nprobe
+        index.exact = exact
+        index.seed = seed
+        index.vectors = data["vectors"]
+        index.centroids = data["centroids"]
+        index.lists = data["lists"]
+        index.trained_size = data["trained_size"]
+        index._init_updates()
+        return index
+
+    def _needs_compaction(self) -> bool:
+        # Also refit the centroids once the KB has doubled since training
+        return super()._needs_compaction() or len(self.articles) > 2 * max(self.trained_size, 8)
+
+    def _train(self, iterations: int = 5, sample_per_list: int = 16):
+        """
+        Fit IVF centroids by spherical k-means on a sample, then assign every
+        article. Articles are assigned by their ASSIGN_DIMS strongest dims,
+        which keeps training and inserts cheap at a small cost in balance.
+        """
+        num_docs = len(self.vectors)
+        num_lists = max(1, min(self.nlist or int(math.sqrt(num_docs)), num_docs))
+        self.trained_size = num_docs
+        if not num_docs:
+            self.centroids, self.lists = [], []
+            return
+        
+        rng = random.Random(self.seed)
+        sample = self.vectors
+        if num_docs > num_lists * sample_per_list:
+            sample = rng.sample(self.vectors, num_lists * sample_per_list)
+        sample_dims = [_nonzero(vector, ASSIGN_DIMS) for vector in sample]
+        self.centroids = rng.sample(sample, num_lists)
+        for _ in range(iterations):
+            sums = [[0.0] * self.dim for _ in self.centroids]
+            for vector, (dims, values) in zip(sample, sample_dims):
+                best = self._nearest(dims, values)
+                sums[best] = list(map(float.__add__, sums[best], vector))
+            for i, total in enumerate(sums):
+                norm = math.sqrt(sum(value * value for value in total))
+                if norm:
+                    self.centroids[i] = array("f", [value / norm for value in total])
+        
+        self.lists = [array("i") for _ in self.centroids]
+        for doc_id, vector in enumerate(self.vectors):
+            self.lists[self._nearest(*_nonzero(vector, ASSIGN_DIMS))].append(doc_id)
+
+    def _centroid_scores(self, dims: List[int], values: List[float]) -> List[float]:
+        if len(dims) < 2:
+            return [sum(value * centroid[d] for d, value in zip(dims, values))
+                    for centroid in self.centroids]
+        pick = itemgetter(*dims)
+        return [sum(map(mul, values, pick(centroid))) for centroid in self.centroids]
+
+    def _nearest(self, dims: List[int], values: List[float]) -> int:
+        scores = self._centroid_scores(dims, values)
+        return max(range(len(scores)), key=scores.__getitem__)
+
+    def _probe(self, dims: List[int], values: List[float], count: int) -> List[int]:
+        """The count IVF lists whose centroids score highest."""
+        scores = self._centroid_scores(dims, values)
+        return heapq.nlargest(count, range(len(scores)), key=scores.__getitem__)
+
+    def score_batch(self, queries: List[str]) -> List[Dict[int, float]]:
+        """
+        Cosine similarity of each query to its candidate articles (those in
+        the nprobe nearest lists, or all when exact); only positive scores
+        are kept. Identical queries are embedded and scored once.
+        """
+        with self._lock:
+            unique_scores = {query: self._score(query) for query in dict.fromkeys(queries)}
+            return [unique_scores[query] for query in queries]
+
+    def _score(self, query: str) -> Dict[int, float]:
+        vector = embed(query, self.dim)
+        dot = _dot_with(vector)
+        if self.exact or len(self.lists) <= self.nprobe:
+            candidates = range(len(self.vectors))
+        else:
+            candidates = itertools.chain.from_iterable(
+                self.lists[i] for i in self._probe(*_nonzero(vector), self.nprobe)
+            )
+        
+        vectors = self.vectors
+        deleted = self.deleted
+        scores = {}
+        for doc_id in candidates:
+            if doc_id not in deleted:
+                score = dot(vectors[doc_id])
+                if score > 0:
+                    scores[doc_id] = score
+        return scores
+
+    def recall(self, queries: List[str], top_k: int = 10) -> float:
+        """Fraction of the exact (brute-force) top_k hits that the IVF search also finds."""
+        with self._lock:
+            approx = self.search_batch(queries, top_k, threshold=0.0)
+            exact, self.exact = self.exact, True
+            try:
+                truth = self.search_batch(queries, top_k, threshold=0.0)
+            finally:
+                self.exact = exact
+        
+        found = total = 0
+        for hits, expected in zip(approx, truth):
+            hit_ids = {article["id"] for article, _ in hits}
+            total += len(expected)
+            found += sum(1 for article, _ in expected if article["id"] in hit_ids)
+        return found / total if total else 1.0
+
+# Available retrieval backends, selected with retrieve_articles(backend=...)
+RETRIEVAL_BACKENDS = {
+    "jaccard": KBIndex,
+    "bm25": BM25Index,
+    "dense": DenseIndex,
+}
+
+_KB_INDEXES: Dict[str, object] = {}
+
+# Index file each shared KB index was opened with (None: built in memory)
+_KB_INDEX_PATHS: Dict[str, Optional[str]] = {}
+
+# Passage-level indexes over chunk_articles(KB_ARTICLES), by backend
+_PASSAGE_INDEXES: Dict[str, object] = {}
+
+def _backend_class(backend: str):
+    """Index class of a retrieval backend; ValueError for unknown names."""
+    if backend not in RETRIEVAL_BACKENDS:
+        raise ValueError(f"Unknown retrieval backend: {backend!r} "
+                         f"(choose from {', '.join(RETRIEVAL_BACKENDS)})")
+    return RETRIEVAL_BACKENDS[backend]
+
+def get_kb_index(backend: str = "jaccard", index_path: Optional[str] = None):
+    """
+    Return the shared KB index for a backend, building it on first use.
+    With index_path, a saved index is memory-mapped instead; a missing,
+    stale (KB_ARTICLES changed) or damaged file is rebuilt and written
+    back. Backends without an on-disk format are always built in memory.
+    Asking for an index file once the backend's index is open from
+    elsewhere (another file, or memory) raises ValueError rather than
+    being ignored.
+    """
+    index_cls = _backend_class(backend)
+    if not hasattr(index_cls, "save"):
+        index_path = None
+    if backend in _KB_INDEXES and index_path is not None and _KB_INDEX_PATHS.get(backend) != index_path:
+        opened = _KB_INDEX_PATHS.get(backend) or "memory"
+        raise ValueError(f"The {backend} index is already open from {opened}, not {index_path}")
+    if backend not in _KB_INDEXES:
+        index = None
+        if index_path is not None and os.path.exists(index_path):
+            try:
+                index = index_cls.load(index_path, KB_ARTICLES)
+            except StaleIndexError:
+                index = None
+        if index is None:
+            index = index_cls(KB_ARTICLES)
+            if index_path is not None:
+                index.save(index_path)
+        _KB_INDEXES[backend] = index
+        _KB_INDEX_PATHS[backend] = index_path
+    return _KB_INDEXES[backend]
+
+def add_article(article: Dict):
+    """Add an article to KB_ARTICLES and every index built from it."""
+    for index in _KB_INDEXES.values():
+        index.add_article(article)
+    for index in _PASSAGE_INDEXES.values():
+        for passage in chunk_article(article):
+            index.add_article(passage)
+    KB_ARTICLES.append(article)
+
+def update_article(article: Dict):
+    """Replace the KB article with the same id, keeping its position in KB_ARTICLES."""
+    position = next((i for i, a in enumerate(KB_ARTICLES) if a["id"] == article["id"]), None)
+    if position is None:
+        raise KeyError(f"Article {article['id']!r} is not in the KB")
+    for index in _KB_INDEXES.values():
+        index.update_article(article)
+    for index in _PASSAGE_INDEXES.values():
+        _replace_passages(index, KB_ARTICLES[position], article)
+    KB_ARTICLES[position] = article
+
+def remove_article(article_id: str):
+    """Remove an article from KB_ARTICLES and every index built from it."""
+    position = next((i for i, a in enumerate(KB_ARTICLES) if a["id"] == article_id), None)
+    if position is None:
+        raise KeyError(f"Article {article_id!r} is not in the KB")
+    for index in _KB_INDEXES.values():
+        index.remove_article(article_id)
+    for index in _PASSAGE_INDEXES.values():
+        _replace_passages(index, KB_ARTICLES[position], None)
+    del KB_ARTICLES[position]
+
+def retrieve_articles(query: str, top_k: int = 2, threshold: float = 0.1,
+                      backend: str = "jaccard") -> List[Tuple[Dict, float]]:
+    """
+    Retrieve relevant articles using similarity search.
+    backend: "jaccard" (word-set overlap), "bm25" (ranked keyword search)
+    or "dense" (hashed-embedding cosine similarity, IVF-partitioned)
+    Returns: List of (article, score) tuples
+    """
+    return get_kb_index(backend).search(query, top_k=top_k, threshold=threshold)
+
+def retrieve_articles_batch(queries: List[str], top_k: int = 2, threshold: float = 0.1,
+                            backend: str = "jaccard") -> List[List[Tuple[Dict, float]]]:
+    """
+    Retrieve articles for many queries in one shared index pass.
+    Returns: one list of (article, score) tuples per query, in input order
+    """
+    return get_kb_index(backend).search_batch(queries, top_k=top_k, threshold=threshold)
+
+# Passage retrieval: articles are split into overlapping passages of whole
+# sentences, indexed individually, and hits are grouped back per article
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+def split_sentences(text: str) -> List[str]:
+    """Split text after sentence-ending punctuation."""
+    return [sentence for sentence in SENTENCE_PATTERN.split(text.strip()) if sentence]
+
+def chunk_article(article: Dict, max_words: int = 40, overlap_words: int = 12) -> List[Dict]:
+    """
+    Split an article into overlapping passages of whole sentences.
+    Each passage holds up to max_words words (a longer sentence becomes a
+    passage of its own) and repeats the previous passage's trailing
+    sentences, up to overlap_words words. Passages keep the parent's title
+    and tags for retrieval, and point back to it via parent_id and span
+    (the [start, end) range of its sentences).
+    """
+    sentences = split_sentences(article["content"])
+    lengths = [len(sentence.split()) for sentence in sentences]
+    spans = []
+    start = 0
+    while start < len(sentences):
+        end = start + 1
+        words = lengths[start]
+        while end < len(sentences) and words + lengths[end] <= max_words:
+            words += lengths[end]
+            end += 1
+        spans.append((start, end))
+        if end == len(sentences):
+            break
+        
+        # Step back over trailing sentences for the overlap, always moving forward
+        next_start, overlap = end, 0
+        while next_start - 1 > start and overlap + lengths[next_start - 1] <= overlap_words:
+            next_start -= 1
+            overlap += lengths[next_start]
+        start = next_start
+    
+    return [
+        {"id": f"{article['id']}#{position}", "parent_id": article["id"],
+         "title": article["title"], "content": " ".join(sentences[start:end]),
+         "tags": article["tags"], "span": [start, end]}
+        for position, (start, end) in enumerate(spans or [(0, 0)])
+    ]
+
+def chunk_articles(articles: List[Dict]) -> List[Dict]:
+    """Passages of every article, in KB order."""
+    return [passage for article in articles for passage in chunk_article(article)]
+
+def _replace_passages(index, old_article: Dict, new_article: Optional[Dict]):
+    for passage in chunk_article(old_article):
+        index.remove_article(passage["id"])
+    if new_article is not None:
+        for passage in chunk_article(new_article):
+            index.add_article(passage)
+
+def get_passage_index(backend: str = "jaccard"):
+    """Return the shared passage-level index for a backend, building it on first use."""
+    index_cls = _backend_class(backend)
+    if backend not in _PASSAGE_INDEXES:
+        _PASSAGE_INDEXES[backend] = index_cls(chunk_articles(KB_ARTICLES))
+    return _PASSAGE_INDEXES[backend]
+
+def merge_passages(passages: List[Dict]) -> str:
+    """
+    Join passages of one article in document order, dropping the sentences
+    that overlapping passages repeat; gaps are marked with an ellipsis.
+    """
+    parts = []
+    covered = None
+    for passage in sorted(passages, key=lambda p: p["span"][0]):
+        start, end = passage["span"]
+        sentences = split_sentences(passage["content"])
+        if covered is not None:
+            if start > covered:
+                parts.append("...")
+            sentences = sentences[max(0, covered - start):]
+        parts.extend(sentences)
+        covered = end if covered is None else max(covered, end)
+    return " ".join(parts)
+
+def group_passage_hits(hits: List[Tuple[Dict, float]], top_k: int = 2,
+                       passages_per_article: int = 1) -> List[Tuple[Dict, float]]:
+    """
+    Deduplicate ranked passage hits per article: the top_k best articles,
+    each scored by its best passage and carrying only its passages_per_article
+    best passages, merged into "content" ("passages" lists their ids).
+    """
+    groups: Dict[str, List[Tuple[Dict, float]]] = {}
+    for passage, score in hits:
+        group = groups.get(passage["parent_id"])
+        if group is None:
+            if len(groups) == top_k:
+                continue
+            group = groups[passage["parent_id"]] = []
+        if len(group) < passages_per_article:
+            group.append((passage, score))
     
-    return relevant[:top_k]
+    results = []
+    for parent_id, group in groups.items():
+        best_passage, best_score = group[0]
+        passages = [passage for passage, _ in group]
+        view = {"id": parent_id, "title": best_passage["title"],
+                "content": merge_passages(passages), "tags": best_passage["tags"],
+                "passages": [passage["id"] for passage in passages]}
+        results.append((view, best_score))
+    return results
+
+def retrieve_passages_batch(queries: List[str], top_k: int = 2, threshold: float = 0.1,
+                            backend: str = "jaccard",
+                            passages_per_article: int = 1) -> List[List[Tuple[Dict, float]]]:
+    """
+    Passage-level retrieve_articles_batch(): queries are scored against
+    passages, and hits are grouped per article by group_passage_hits().
+    Only top_k * passages_per_article * 4 passages are ranked per query; a
+    query whose full fetch still covers fewer than top_k articles is
+    re-ranked with a wider fetch. The chosen articles and scores match a
+    full ranking; with passages_per_article > 1, an article's extra
+    passages come from the fetched window only.
+    Returns: one list of (article with relevant passages only, score) per query
+    """
+    index = get_passage_index(backend)
+    results: List[Optional[List[Tuple[Dict, float]]]] = [None] * len(queries)
+    pending = list(range(len(queries)))
+    fetch = max(1, top_k * passages_per_article * 4)
+    while pending:
+        hits_batch = index.search_batch([queries[i] for i in pending], top_k=fetch, threshold=threshold)
+        widen = []
+        for i, hits in zip(pending, hits_batch):
+            grouped = group_passage_hits(hits, top_k, passages_per_article)
+            # A full fetch may hide further articles behind one article's passages
+            if len(grouped) < top_k and len(hits) == fetch:
+                widen.append(i)
+            else:
+                results[i] = grouped
+        pending = widen
+        fetch *= 4
+    return results
+
+def retrieve_passages(query: str, top_k: int = 2, threshold: float = 0.1, backend: str = "jaccard",
+                      passages_per_article: int = 1) -> List[Tuple[Dict, float]]:
+    """Retrieve the best articles for one query, each with only its relevant passages."""
+    return retrieve_passages_batch([query], top_k, threshold, backend, passages_per_article)[0]
+
+NO_ANSWER = "I couldn't find any specific articles related to your query in the knowledge base. Could you try rephrasing?"
+
+def answer_lead(query: str) -> str:
+    """Template opening of a generated answer (mock LLM)."""
+    query_lower = query.lower()
+    
+    if "automation" in query_lower:
+        return "Based on our knowledge base, you can configure automations in the Admin Panel. "
+    elif "csat" in query_lower:
+        return "Regarding CSAT visibility: "
+    else:
+        return "Here is what I found: "
 
 def generate_answer(query: str, retrieved_articles: List[Tuple[Dict, float]]) -> Dict:
     """
@@ -95,7 +1403,7 @@ def generate_answer(query: str, retrieved_articles: List[Tuple[Dict, float]]) ->
     """
     if not retrieved_articles:
         return {
-            "answer": "I couldn't find any specific articles related to your query in the knowledge base. Could you try rephrasing?",
+            "answer": NO_ANSWER,
             "confidence": 0.0,
             "sources": []
         }
@@ -104,14 +1412,7 @@ def generate_answer(query: str, retrieved_articles: List[Tuple[Dict, float]]) ->
     top_article, top_score = retrieved_articles[0]
     
     # Simple template-based generation (mock LLM)
-    query_lower = query.lower()
-    
-    if "automation" in query_lower:
-        answer = f"Based on our knowledge base, you can configure automations in the Admin Panel. {top_article['content']}"
-    elif "csat" in query_lower:
-        answer = f"Regarding CSAT visibility: {top_article['content']}"
-    else:
-        answer = f"Here is what I found: {top_article['content']}"
+    answer = f"{answer_lead(query)}{top_article['content']}"
     
     # Extract sources
     sources = [article["title"] for article, _ in retrieved_articles]
@@ -123,72 +1424,428 @@ def generate_answer(query: str, retrieved_articles: List[Tuple[Dict, float]]) ->
         "retrieved_articles": [article for article, _ in retrieved_articles]
     }
 
-def query_rag(query: str) -> Dict:
+# Split points after sentence-ending punctuation; the whitespace stays with the next piece
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])(?=\s)")
+
+def generate_answer_stream(query: str, retrieved_articles: List[Tuple[Dict, float]]) -> Iterator[str]:
+    """
+    Generate the answer of generate_answer() incrementally: the opening,
+    then the top article one sentence at a time. The joined chunks equal
+    its "answer"; closing the generator stops the remaining generation.
+    """
+    if not retrieved_articles:
+        yield NO_ANSWER
+        return
+    top_article = retrieved_articles[0][0]
+    yield answer_lead(query)
+    for piece in _SENTENCE_BREAK.split(top_article["content"]):
+        if piece:
+            yield piece
+
+def generate_answer_batch(queries: List[str],
+                          retrieved_batch: List[List[Tuple[Dict, float]]]) -> List[Dict]:
+    """
+    Generate answers for many queries from their retrieved articles.
+    Returns: one answer dict per query, in input order
+    """
+    return [generate_answer(query, retrieved)
+            for query, retrieved in zip(queries, retrieved_batch)]
+
+ANSWER_PROMPT = """You are a customer support assistant. Answer the question using only the
+knowledge base articles provided. If they do not answer it, say so."""
+
+def answer_request(query: str, retrieved_articles: List[Tuple[Dict, float]]) -> Dict:
+    """
+    Build a model backend request for one query (see llm_backend.py).
+    Retrieval scores stay out: the prompt does not use them, and as part
+    of the response cache key they would go stale on every KB edit.
+    """
+    context = [article for article, _ in retrieved_articles]
+    return {"task": "rag", "prompt": ANSWER_PROMPT, "input": query, "context": context}
+
+async def generate_answer_batch_async(queries: List[str],
+                                      retrieved_batch: List[List[Tuple[Dict, float]]],
+                                      backend=None) -> List[Dict]:
+    """
+    Generate answers through a model backend (e.g. llm_backend.HTTPBackend).
+    With no backend, the template generator is used. Queries without
+    retrieved articles get the canned reply without a backend call;
+    confidence and sources always come from retrieval.
+    Returns: one answer dict per query, in input order
+    """
+    results = generate_answer_batch(queries, retrieved_batch)
+    if backend is None:
+        return results
+
+    pending = [i for i, retrieved in enumerate(retrieved_batch) if retrieved]
+    with METRICS.span("rag.model"):
+        outputs = await backend.complete_batch([answer_request(queries[i], retrieved_batch[i])
+                                                for i in pending])
+    for i, answer in zip(pending, outputs):
+        results[i]["answer"] = answer
+    return results
+
+class QueryCache:
+    """
+    Bounded LRU cache of RAG results, with an optional TTL.
+    Keys combine the backend, the normalized query (lowercased, whitespace
+    collapsed - neither changes retrieval or generation) and the index
+    version, so any KB update invalidates earlier entries automatically.
+    Cached values are shared: treat returned results as read-only.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, object]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Canonical form of a query for cache lookups."""
+        return " ".join(query.lower().split())
+
+    def key(self, query: str, backend: str) -> Tuple[str, int, str]:
+        """Cache key for a query against the backend's current index version."""
+        return (backend, get_kb_index(backend).version, self.normalize(query))
+
+    def get(self, key: Tuple):
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            self._check_version(key)
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                METRICS.inc("cache_misses_total", cache="rag_query")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            METRICS.inc("cache_hits_total", cache="rag_query")
+            return entry[1]
+
+    def put(self, key: Tuple, value):
+        """Store value under key, evicting least recently used entries past max_size."""
+        expires = time.monotonic() + self.ttl if self.ttl is not None else math.inf
+        with self._lock:
+            self._check_version(key)
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _check_version(self, key: Tuple):
+        # A newer index version for the backend makes its older entries unreachable
+        backend, version = key[0], key[1]
+        known = self._versions.get(backend)
+        if known == version:
+            return
+        self._versions[backend] = version
+        if known is not None:
+            stale = [k for k in self._entries if k[0] == backend and k[1] != version]
+            for k in stale:
+                del self._entries[k]
+            self.invalidations += len(stale)
+
+def query_rag_batch(queries: List[str], backend: str = "jaccard",
+                    cache: Optional[QueryCache] = None) -> List[Dict]:
+    """
+    Complete RAG pipeline for many queries, without console output.
+    With a cache, only the misses go through batched retrieval and generation.
+    """
+    if cache is None:
+        with METRICS.span("rag.retrieve"):
+            retrieved_batch = retrieve_articles_batch(queries, top_k=2, threshold=0.1, backend=backend)
+        with METRICS.span("rag.generate"):
+            return generate_answer_batch(queries, retrieved_batch)
+    
+    keys = [cache.key(query, backend) for query in queries]
+    results = [cached[1] if cached is not None else None
+               for cached in (cache.get(key) for key in keys)]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        miss_queries = [queries[i] for i in missing]
+        with METRICS.span("rag.retrieve"):
+            retrieved_batch = retrieve_articles_batch(miss_queries, top_k=2, threshold=0.1, backend=backend)
+        with METRICS.span("rag.generate"):
+            answers = generate_answer_batch(miss_queries, retrieved_batch)
+        for i, retrieved, result in zip(missing, retrieved_batch, answers):
+            cache.put(keys[i], (retrieved, result))
+            results[i] = result
+    return results
+
+def rag_record(query: str, retrieved: List[Tuple[Dict, float]], result: Dict) -> Dict:
+    """Structured, JSON-ready summary of one RAG query."""
+    return {
+        "query": query,
+        "retrieved": [{"id": article["id"], "title": article["title"], "score": score}
+                      for article, score in retrieved],
+        "answer": result["answer"],
+        "confidence": result["confidence"],
+        "sources": result["sources"],
+    }
+
+def run_queries(queries: List[str], backend: str = "jaccard", model=None,
+                passages: bool = False) -> List[Dict]:
+    """
+    Run the RAG pipeline over many queries without output; returns rag_record()s.
+    With a model backend (closed afterwards), answers are generated through it.
+    With passages, retrieval is passage-level and generation only sees the
+    best passage of each retrieved article.
+    """
+    retrieve_batch = retrieve_passages_batch if passages else retrieve_articles_batch
+    with METRICS.span("rag.retrieve"):
+        retrieved_batch = retrieve_batch(queries, top_k=2, threshold=0.1, backend=backend)
+    with METRICS.span("rag.generate"):
+        if model is None:
+            answers = generate_answer_batch(queries, retrieved_batch)
+        else:
+            answers = run_and_close(model, generate_answer_batch_async(queries, retrieved_batch, model))
+    return [rag_record(query, retrieved, result)
+            for query, retrieved, result in zip(queries, retrieved_batch, answers)]
+
+def query_report_lines(record: Dict, cached: bool = False) -> List[str]:
+    """Console lines for one rag_record()."""
+    note = " (cached)" if cached else ""
+    lines = [
+        "",
+        "="*60,
+        f"Query: {record['query']}",
+        "="*60,
+        "",
+        "Step 1: Retrieving relevant articles..." + note,
+        f"Retrieved {len(record['retrieved'])} articles:",
+    ]
+    for item in record["retrieved"]:
+        lines.append(f"  - {item['title']} (score: {item['score']:.3f})")
+    
+    lines += [
+        "",
+        "Step 2: Generating answer..." + note,
+        "",
+        f"Answer (confidence: {record['confidence']:.1%}):",
+        f"  {record['answer']}",
+        "",
+        "Sources:",
+    ]
+    for source in record["sources"]:
+        lines.append(f"  - {source}")
+    return lines
+
+def query_rag(query: str, backend: str = "jaccard", cache: Optional[QueryCache] = None) -> Dict:
     """
     Complete RAG pipeline: Retrieve + Generate.
+    With a cache, a repeated query skips both steps.
     """
-    print(f"\n{'='*60}")
-    print(f"Query: {query}")
-    print(f"{'='*60}\n")
+    key = cache.key(query, backend) if cache is not None else None
+    cached = cache.get(key) if cache is not None else None
     
-    # Step 1: Retrieval
-    print("Step 1: Retrieving relevant articles...")
-    retrieved = retrieve_articles(query, top_k=2, threshold=0.1)
+    if cached:
+        retrieved, result = cached
+    else:
+        # Step 1: Retrieval
+        with METRICS.span("rag.retrieve"):
+            retrieved = retrieve_articles(query, top_k=2, threshold=0.1, backend=backend)
+        
+        # Step 2: Generation
+        with METRICS.span("rag.generate"):
+            result = generate_answer(query, retrieved)
+        if cache is not None:
+            cache.put(key, (retrieved, result))
     
-    print(f"Retrieved {len(retrieved)} articles:")
-    for article, score in retrieved:
-        print(f"  - {article['title']} (score: {score:.3f})")
+    write_lines(query_report_lines(rag_record(query, retrieved, result), cached=bool(cached)))
+    return result
+
+def sources_event(query: str, retrieved: List[Tuple[Dict, float]]) -> Dict:
+    """First event of a RAG stream: what was retrieved, before any generation."""
+    return {
+        "event": "sources",
+        "query": query,
+        "retrieved": [{"id": article["id"], "title": article["title"], "score": score}
+                      for article, score in retrieved],
+        "confidence": retrieved[0][1] if retrieved else 0.0,
+        "sources": [article["title"] for article, _ in retrieved],
+    }
+
+def query_rag_stream(query: str, backend: str = "jaccard", passages: bool = False) -> Iterator[Dict]:
+    """
+    Streaming RAG pipeline. Yields a "sources" event (retrieved articles and
+    scores) as soon as retrieval is done, then {"event": "answer", "text"}
+    chunks as they are generated, then {"event": "done"}. Stop iterating
+    (or close() the generator) to cancel the remaining generation.
+    """
+    retrieve = retrieve_passages if passages else retrieve_articles
+    with METRICS.span("rag.retrieve"):
+        retrieved = retrieve(query, top_k=2, threshold=0.1, backend=backend)
+    yield sources_event(query, retrieved)
     
-    # Step 2: Generation
-    print("\nStep 2: Generating answer...")
-    result = generate_answer(query, retrieved)
+    for chunk in generate_answer_stream(query, retrieved):
+        yield {"event": "answer", "text": chunk}
+    yield {"event": "done"}
+
+async def query_rag_stream_async(query: str, backend: str = "jaccard", passages: bool = False,
+                                 model=None) -> AsyncIterator[Dict]:
+    """
+    Async query_rag_stream(). With a model backend the answer arrives as
+    the backend streams it (LLMBackend.stream), otherwise from the template
+    generator, yielding to the event loop between chunks. Cancelling the
+    consuming task, or aclose(), stops the remaining generation.
+    """
+    retrieve = retrieve_passages if passages else retrieve_articles
+    with METRICS.span("rag.retrieve"):
+        retrieved = retrieve(query, top_k=2, threshold=0.1, backend=backend)
+    yield sources_event(query, retrieved)
     
-    print(f"\nAnswer (confidence: {result['confidence']:.1%}):")
-    print(f"  {result['answer']}")
+    if model is not None and retrieved:
+        async for chunk in model.stream(answer_request(query, retrieved)):
+            yield {"event": "answer", "text": chunk}
+    else:
+        for chunk in generate_answer_stream(query, retrieved):
+            yield {"event": "answer", "text": chunk}
+            await asyncio.sleep(0)
+    yield {"event": "done"}
+
+BACKEND_DESCRIPTIONS = {
+    "jaccard": "Jaccard similarity (mock embedding)",
+    "bm25": "BM25 keyword ranking",
+    "dense": "Dense hashed embeddings (IVF approximate search)",
+}
+
+def report_console(records: List[Dict], backend: str = "jaccard", quiet: bool = False):
+    """Console report for run_queries() output; quiet keeps only the summary."""
+    lines = [
+        "="*60,
+        "Part C — Mini-RAG for Knowledge Base Answering",
+        "="*60,
+    ]
+    if not quiet:
+        for record in records:
+            lines += query_report_lines(record)
+            lines.append("")
     
-    print(f"\nSources:")
-    for source in result['sources']:
-        print(f"  - {source}")
+    # Summary
+    lines += ["="*60, "SUMMARY", "="*60]
+    for i, record in enumerate(records, 1):
+        lines += [
+            "",
+            f"Query {i}: {record['query']}",
+            f"  Confidence: {record['confidence']:.1%}",
+            f"  Sources: {len(record['sources'])}",
+        ]
     
-    return result
+    lines += [
+        "",
+        "="*60,
+        "RAG System Components:",
+        f"1. Retrieval: {BACKEND_DESCRIPTIONS.get(backend, backend)}",
+        "2. Generation: Template-based (mock LLM)",
+        "3. Confidence: Based on retrieval score",
+        "="*60,
+    ]
+    write_lines(lines)
 
-def main():
+CSV_FIELDS = ["query", "confidence", "sources", "answer"]
+
+def report_csv(records: List[Dict]):
+    """One CSV row per query; sources joined with "; "."""
+    write_csv(({**record, "sources": "; ".join(record["sources"])} for record in records), CSV_FIELDS)
+
+def main(argv: Optional[List[str]] = None):
     """Main execution function."""
-    print("="*60)
-    print("Part C — Mini-RAG for Knowledge Base Answering")
-    print("="*60)
+    parser = argparse.ArgumentParser(description="Part C — Mini-RAG for Knowledge Base Answering")
+    parser.add_argument("--query", action="append", dest="queries", metavar="TEXT",
+                        help="query to answer (repeatable; default: the assignment queries)")
+    parser.add_argument("--backend", choices=list(RETRIEVAL_BACKENDS), default="jaccard",
+                        help="retrieval backend (default: jaccard)")
+    parser.add_argument("--passages", action="store_true",
+                        help="retrieve overlapping article passages instead of whole articles")
+    parser.add_argument("--stream", action="store_true",
+                        help="write each query's sources, then answer chunks, as JSON lines while generating")
+    parser.add_argument("--index", metavar="PATH",
+                        help="memory-map a saved index file, building and saving it if missing, stale or damaged")
+    add_model_arguments(parser)
+    add_output_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    enable_from_args(args)
+    if args.stream and args.format != "console":
+        parser.error("--stream always writes JSON lines; --format does not apply")
+    if args.index:
+        if not hasattr(RETRIEVAL_BACKENDS[args.backend], "save"):
+            parser.error(f"--index: the {args.backend} backend has no on-disk format")
+        if args.passages:
+            parser.error("--index applies to article indexes, not --passages")
+        get_kb_index(args.backend, args.index)
     
     # Required queries from assignment
-    queries = [
+    queries = args.queries or [
         "How do I configure automations in Hiver?",
         "Why is CSAT not appearing?"
     ]
     
-    results = []
-    for query in queries:
-        result = query_rag(query)
-        results.append({
-            "query": query,
-            "result": result
-        })
-        print()
+    model = backend_from_args(args)
+    if args.stream:
+        def write_event(event: Dict):
+            sys.stdout.write(json.dumps(event, ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+
+        if model is None:
+            for query in queries:
+                for event in query_rag_stream(query, backend=args.backend, passages=args.passages):
+                    write_event(event)
+        else:
+            # --model-url / --response-cache: answers stream from the model backend
+            async def stream_queries():
+                for query in queries:
+                    async for event in query_rag_stream_async(query, args.backend, args.passages, model):
+                        write_event(event)
+            run_and_close(model, stream_queries())
+            report_cache_stats(model)
+        export_metrics(args)
+        return
     
-    # Summary
-    print("="*60)
-    print("SUMMARY")
-    print("="*60)
-    for i, item in enumerate(results, 1):
-        print(f"\nQuery {i}: {item['query']}")
-        print(f"  Confidence: {item['result']['confidence']:.1%}")
-        print(f"  Sources: {len(item['result']['sources'])}")
-    
-    print("\n" + "="*60)
-    print("RAG System Components:")
-    print("1. Retrieval: Jaccard similarity (mock embedding)")
-    print("2. Generation: Template-based (mock LLM)")
-    print("3. Confidence: Based on retrieval score")
-    print("="*60)
+    records = run_queries(queries, backend=args.backend, model=model, passages=args.passages)
+    report_cache_stats(model)
+    
+    if args.format == "json":
+        write_json({"backend": args.backend, "queries": records})
+    elif args.format == "csv":
+        report_csv(records)
+    else:
+        report_console(records, backend=args.backend, quiet=args.quiet)
+    export_metrics(args)
 
 if __name__ == "__main__":
     main()
-
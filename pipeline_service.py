@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Long-running HTTP service for the three pipelines.
+The classifier registry, sentiment analyzers and RAG index are loaded
+once at startup and shared by every request, so callers pay neither
+process startup nor index builds. Request bodies are JSON batches:
+
+  POST /classify   {"emails": [{"customer_id", "subject", "body", "email_id"?, "tag"?}, ...]}
+  POST /sentiment  {"texts": ["...", ...], "prompt_version": "v1" | "v2"}
+  POST /rag        {"queries": ["...", ...]}
+  GET  /health     GET /metrics (Prometheus text; see instrumentation.py)
+
+Connections are kept alive. CPU-bound batches run in worker threads, at
+most --concurrency at a time; requests beyond --max-pending get 429 with
+Retry-After instead of queueing without bound. SIGINT/SIGTERM stop
+accepting connections, then finish in-flight requests before exiting.
+
+Run: python pipeline_service.py --port 8810 --backend bm25
+     curl -s localhost:8810/rag -d '{"queries": ["Why is CSAT not appearing?"]}'
+"""
+
+import argparse
+import asyncio
+import json
+import signal
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+
+import part_a_email_tagging as part_a
+import part_b_sentiment_analysis as part_b
+import part_c_rag_system as part_c
+from async_http import ServerConnections, server_url, start_server
+from instrumentation import METRICS, add_metrics_arguments, enable_from_args, export_metrics
+from llm_backend import add_model_arguments, backend_from_args, report_cache_stats
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+Response = Tuple[int, Dict[str, str], bytes]
+
+class RequestError(ValueError):
+    """Invalid request body; reported to the client as a JSON error."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+def json_response(status: int, data, headers: Optional[Dict[str, str]] = None) -> Response:
+    return status, {**JSON_HEADERS, **(headers or {})}, json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+def _batch(body: Dict, field: str, max_batch: int) -> List:
+    items = body.get(field)
+    if not isinstance(items, list) or not items:
+        raise RequestError(f'"{field}" must be a non-empty list')
+    if len(items) > max_batch:
+        raise RequestError(f'"{field}" holds {len(items)} items; the limit is {max_batch}', status=413)
+    return items
+
+class PipelineService:
+    """
+    Warm pipeline state plus the request handler for async_http.start_server.
+    The model backend, if any, serves Part B and Part C model calls and is
+    shared across requests (HTTPBackend batches them together).
+    """
+
+    def __init__(self, backend: str = "jaccard", passages: bool = False, model=None,
+                 concurrency: int = 4, max_pending: int = 64, max_batch: int = 1000,
+                 index_path: Optional[str] = None):
+        self.backend = backend
+        self.passages = passages
+        self.index_path = index_path
+        self.model = model
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self.pending = 0
+        self._slots = asyncio.Semaphore(concurrency)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.routes: Dict[str, Callable] = {
+            "/classify": self.classify,
+            "/sentiment": self.sentiment,
+            "/rag": self.rag,
+        }
+
+    def load(self):
+        """Build everything the endpoints share, before the first request arrives."""
+        for customer_id in part_a.EMAIL_STORE.customers():
+            part_a.CLASSIFIER_REGISTRY.get(customer_id)
+        part_b.extract_features("warm up")
+        part_c.get_kb_index(self.backend, self.index_path)
+        if self.passages:
+            part_c.get_passage_index(self.backend)
+
+    async def _run(self, func: Callable, *args):
+        # CPU-bound work leaves the event loop free for other connections
+        async with self._slots:
+            return await asyncio.to_thread(func, *args)
+
+    async def classify(self, body: Dict) -> Dict:
+        emails = _batch(body, "emails", self.max_batch)
+        for position, email in enumerate(emails):
+            if not isinstance(email, dict) or not all(isinstance(email.get(field), str)
+                                                      for field in ("customer_id", "subject", "body")):
+                raise RequestError(f"emails[{position}] needs string customer_id, subject and body")
+        results = await self._run(lambda: list(part_a.classify_stream(emails)))
+        return {"results": results}
+
+    async def sentiment(self, body: Dict) -> Dict:
+        texts = _batch(body, "texts", self.max_batch)
+        if not all(isinstance(text, str) for text in texts):
+            raise RequestError('"texts" must hold strings')
+        version = body.get("prompt_version", "v2")
+        if version not in part_b.PROMPT_VARIANTS:
+            raise RequestError(f"Unknown prompt_version {version!r} "
+                               f"(choose from {', '.join(part_b.PROMPT_VARIANTS)})")
+        if self.model is None:
+            analyzer = part_b.PROMPT_VARIANTS[version]["analyzer"]
+            METRICS.inc("emails_analyzed_total", len(texts), prompt=version)
+            with METRICS.span("sentiment.analyze"):
+                outputs = await self._run(lambda: [analyzer(text) for text in texts])
+        else:
+            outputs = await part_b.analyze_sentiment_batch_async(texts, version, self.model)
+        return {"prompt_version": version, "results": outputs}
+
+    async def rag(self, body: Dict) -> Dict:
+        queries = _batch(body, "queries", self.max_batch)
+        if not all(isinstance(query, str) for query in queries):
+            raise RequestError('"queries" must hold strings')
+        retrieve_batch = part_c.retrieve_passages_batch if self.passages else part_c.retrieve_articles_batch
+        with METRICS.span("rag.retrieve"):
+            retrieved_batch = await self._run(retrieve_batch, queries, 2, 0.1, self.backend)
+        with METRICS.span("rag.generate"):
+            if self.model is None:
+                answers = await self._run(part_c.generate_answer_batch, queries, retrieved_batch)
+            else:
+                answers = await part_c.generate_answer_batch_async(queries, retrieved_batch, self.model)
+        return {"backend": self.backend, "passages": self.passages,
+                "results": [part_c.rag_record(query, retrieved, answer)
+                            for query, retrieved, answer in zip(queries, retrieved_batch, answers)]}
+
+    async def handle(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> Response:
+        """async_http handler: route, enforce the pending limit, and map errors to JSON."""
+        path = path.split("?", 1)[0]
+        if path == "/health":
+            return json_response(200, {"status": "ok", "backend": self.backend,
+                                       "passages": self.passages, "pending": self.pending})
+        if path == "/metrics":
+            return 200, {"Content-Type": "text/plain; version=0.0.4"}, METRICS.to_prometheus().encode("utf-8")
+        endpoint = self.routes.get(path)
+        if endpoint is None:
+            return json_response(404, {"error": f"Unknown endpoint {path}"})
+        if method != "POST":
+            return json_response(405, {"error": "Use POST"})
+        if self.pending >= self.max_pending:
+            METRICS.inc("requests_total", endpoint=path, status=429)
+            return json_response(429, {"error": "Too many pending requests"}, {"Retry-After": "1"})
+
+        self.pending += 1
+        self._idle.clear()
+        try:
+            with METRICS.span(f"service.{path[1:]}"):
+                try:
+                    request = json.loads(body or b"{}")
+                    if not isinstance(request, dict):
+                        raise RequestError("Request body must be a JSON object")
+                    status, data = 200, await endpoint(request)
+                except json.JSONDecodeError as e:
+                    status, data = 400, {"error": f"Invalid JSON: {e}"}
+                except RequestError as e:
+                    status, data = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, data = 500, {"error": f"{type(e).__name__}: {e}"}
+            METRICS.inc("requests_total", endpoint=path, status=status)
+            return json_response(status, data)
+        finally:
+            self.pending -= 1
+            if not self.pending:
+                self._idle.set()
+
+    async def drain(self):
+        """Wait until no request is in flight."""
+        await self._idle.wait()
+
+async def serve(service: PipelineService, host: str, port: int, idle_timeout: float):
+    """
+    Serve until SIGINT/SIGTERM, then close idle keep-alive connections,
+    drain in-flight requests and close the model backend.
+    """
+    connections = ServerConnections()
+    server = await start_server(service.handle, host, port, idle_timeout=idle_timeout, connections=connections)
+    sys.stderr.write(f"Pipeline service listening on {server_url(server)} (backend: {service.backend})\n")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    await stop.wait()
+
+    sys.stderr.write("Shutting down: finishing in-flight requests\n")
+    server.close()
+    connections.close_idle()
+    await server.wait_closed()
+    await service.drain()
+    if service.model is not None:
+        await service.model.close()
+        report_cache_stats(service.model)
+
+def main(argv: Optional[List[str]] = None):
+    """Main execution function."""
+    parser = argparse.ArgumentParser(description="Long-running HTTP service for the three pipelines")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8810)
+    parser.add_argument("--backend", choices=list(part_c.RETRIEVAL_BACKENDS), default="jaccard",
+                        help="Part C retrieval backend (default: jaccard)")
+    parser.add_argument("--passages", action="store_true", help="Part C: passage-level retrieval")
+    parser.add_argument("--index", metavar="PATH",
+                        help="Part C: memory-map a saved article index, building and saving it if missing, stale or damaged")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="CPU-bound batches processed at once (default: 4)")
+    parser.add_argument("--max-pending", type=int, default=64,
+                        help="in-flight requests before answering 429 (default: 64)")
+    parser.add_argument("--max-batch", type=int, default=1000,
+                        help="items allowed per request body (default: 1000)")
+    parser.add_argument("--idle-timeout", type=float, default=30.0,
+                        help="seconds an idle keep-alive connection stays open (default: 30)")
+    add_model_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    enable_from_args(args)
+    if args.index and not hasattr(part_c.RETRIEVAL_BACKENDS[args.backend], "save"):
+        parser.error(f"--index: the {args.backend} backend has no on-disk format")
+
+    async def run():
+        service = PipelineService(args.backend, args.passages, backend_from_args(args),
+                                  args.concurrency, args.max_pending, args.max_batch, args.index)
+        service.load()
+        await serve(service, args.host, args.port, args.idle_timeout)
+
+    asyncio.run(run())
+    export_metrics(args)
+
+if __name__ == "__main__":
+    main()
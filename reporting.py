@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Shared report writers for the standalone scripts.
+Each reporter renders a whole run in memory and writes it with a single
+call, so the compute path never does per-item terminal I/O.
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+from typing import Dict, Iterable, List, Optional, TextIO
+
+OUTPUT_FORMATS = ("console", "json", "csv")
+
+def add_output_arguments(parser: argparse.ArgumentParser):
+    """Add the shared --format/--quiet switches to a script's CLI."""
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="console",
+                        help="report format (default: console)")
+    parser.add_argument("--quiet", action="store_true",
+                        help="console format: skip per-item output, print the summary only")
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values (0.0 when empty)."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def write_lines(lines: List[str], stream: Optional[TextIO] = None):
+    """Write console lines in one call."""
+    (stream or sys.stdout).write("\n".join(lines) + "\n")
+
+def write_json(data, stream: Optional[TextIO] = None):
+    """Write data as one indented JSON document."""
+    (stream or sys.stdout).write(json.dumps(data, indent=2, ensure_ascii=False, default=str) + "\n")
+
+def write_csv(rows: Iterable[Dict], fieldnames: List[str], stream: Optional[TextIO] = None):
+    """Write rows as CSV with a header, rendered in memory first."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+    (stream or sys.stdout).write(buffer.getvalue())
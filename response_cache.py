@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Persistent, content-addressed cache of model responses (SQLite, standard library).
+Entries are keyed by a hash of (prompt text, model id, input), so a
+response is reused exactly when none of the three changed. The cache is
+bounded by size with least-recently-used eviction and counts hits/misses.
+"""
+
+import hashlib
+import json
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# SQLite's default limit on bound parameters is 999
+_SQL_CHUNK = 500
+
+def cache_key(prompt: str, model_id: str, input_text: str) -> str:
+    """Content address of one model call."""
+    payload = json.dumps([prompt, model_id, input_text], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _chunks(items: List, size: int = _SQL_CHUNK) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class ResponseCache:
+    """
+    SQLite-backed response cache.
+    When the stored outputs exceed max_bytes, the least recently used
+    entries are deleted down to 90% of the limit, so eviction runs in
+    occasional batches instead of on every insert.
+    """
+
+    def __init__(self, path: str = ":memory:", max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, output TEXT NOT NULL,"
+            " size INTEGER NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used)")
+        self.conn.commit()
+
+        entries, total, clock = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(MAX(last_used), 0) FROM responses"
+        ).fetchone()
+        self.entries = entries
+        self.total_bytes = total
+        # Logical clock for LRU order, persisted through last_used
+        self._clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """Look up many keys at once; returns {key: output} for the hits."""
+        unique = list(dict.fromkeys(keys))
+        found: Dict[str, str] = {}
+        for chunk in _chunks(unique):
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self.conn.execute(
+                f"SELECT key, output FROM responses WHERE key IN ({placeholders})", chunk
+            ))
+        if found:
+            now = self._tick()
+            self.conn.executemany("UPDATE responses SET last_used = ? WHERE key = ?",
+                                  [(now, key) for key in found])
+            self.conn.commit()
+
+        hits = sum(1 for key in keys if key in found)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return found
+
+    def get(self, key: str) -> Optional[str]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, outputs: Dict[str, str], model_id: str = ""):
+        """Store {key: output}, replacing existing entries, then evict if over size."""
+        if not outputs:
+            return
+        now = self._tick()
+        rows = [(key, model_id, output, len(key) + len(output.encode("utf-8")), now)
+                for key, output in outputs.items()]
+        keys = list(outputs)
+        replaced_entries = replaced_bytes = 0
+        for chunk in _chunks(keys):
+            placeholders = ",".join("?" * len(chunk))
+            count, size = self.conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE key IN ({placeholders})",
+                chunk
+            ).fetchone()
+            replaced_entries += count
+            replaced_bytes += size
+        self.conn.executemany("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", rows)
+        self.entries += len(rows) - replaced_entries
+        self.total_bytes += sum(row[3] for row in rows) - replaced_bytes
+        if self.total_bytes > self.max_bytes:
+            self._evict(int(self.max_bytes * 0.9))
+        self.conn.commit()
+
+    def put(self, key: str, output: str, model_id: str = ""):
+        self.put_many({key: output}, model_id)
+
+    def _evict(self, target_bytes: int):
+        """Delete least recently used entries until at most target_bytes remain."""
+        victims = []
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if self.total_bytes <= target_bytes:
+                break
+            victims.append((key,))
+            self.total_bytes -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.entries -= len(victims)
+        self.evictions += len(victims)
+
+    def clear(self):
+        self.conn.execute("DELETE FROM responses")
+        self.conn.commit()
+        self.entries = 0
+        self.total_bytes = 0
+
+    def __len__(self) -> int:
+        return self.entries
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self.entries,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+def stats_line(stats: Dict) -> str:
+    """One-line console summary of stats()."""
+    return (f"Response cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.1%} hit rate), {stats['entries']} entries, "
+            f"{stats['bytes'] / 1024:.1f} KiB of {stats['max_bytes'] / 1024 / 1024:.1f} MiB, "
+            f"{stats['evictions']} evicted")
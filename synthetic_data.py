@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic workloads for scaling tests of all three parts.
+The same seed gives the same records in any process. Emails spread over
+many customers with Zipf-skewed tenant sizes; their text comes from
+per-topic phrase banks built around the tagging rules' and sentiment
+keywords, with filler and keyword-free topics that hit the fallback path.
+Records are generated lazily, so 10^7 of them stream in constant memory.
+
+Run: python synthetic_data.py emails 100000 --seed 7 > emails.jsonl
+     python synthetic_data.py articles 5000 > kb.jsonl
+"""
+
+import argparse
+import json
+import random
+import sys
+from bisect import bisect
+from itertools import accumulate
+from typing import Dict, Iterator, List, Optional
+
+# Email topics: ground-truth tag, sentiment label, subjects and body phrases
+EMAIL_TOPICS = {
+    "access_issue": {
+        "label": "negative",
+        "subjects": ["Unable to access shared mailbox", "Login problems", "Permission error on inbox"],
+        "phrases": ["I'm unable to access the {object} since {time}.",
+                    "It keeps showing a permissions error when {actor} opens the {object}.",
+                    "The login page fails for {actor}."],
+    },
+    "workflow_issue": {
+        "label": "negative",
+        "subjects": ["Rules not working", "Workflow stopped", "Assignment rule broken"],
+        "phrases": ["We created a rule to auto-assign emails but it stopped working {time}.",
+                    "Our workflow is not working for the {object}.",
+                    "The rule we set up for {actor} does not fire anymore."],
+    },
+    "tagging_issue": {
+        "label": "negative",
+        "subjects": ["Tags missing", "Wrong tags applied", "Tagging stopped"],
+        "phrases": ["Many of our tags are missing on the {object}.",
+                    "The tagging model is not working for {actor}.",
+                    "New emails get no tags since {time}."],
+    },
+    "billing": {
+        "label": "negative",
+        "subjects": ["Billing query", "Invoice incorrect", "Charged twice"],
+        "phrases": ["We were charged incorrectly {time}.",
+                    "Please send a corrected invoice for {actor}.",
+                    "Our billing shows seats we removed."],
+    },
+    "analytics_issue": {
+        "label": "negative",
+        "subjects": ["CSAT not visible", "CSAT scores disappeared", "Dashboard missing CSAT"],
+        "phrases": ["CSAT scores disappeared from the {object} {time}.",
+                    "The CSAT report is missing data for {actor}.",
+                    "Is there an outage affecting CSAT?"],
+    },
+    "performance": {
+        "label": "negative",
+        "subjects": ["Delay in email loading", "App is slow", "Lag when switching views"],
+        "phrases": ["Opening the {object} is very slow {time}.",
+                    "There is a lag of several seconds for {actor}.",
+                    "Loading conversations takes 8-10 seconds."],
+    },
+    "setup_help": {
+        "label": "neutral",
+        "subjects": ["Need help setting up SLAs", "SLA configuration", "Question about SLA tiers"],
+        "phrases": ["We want to configure SLAs for different customer tiers.",
+                    "Can someone guide us through SLA policies for {actor}?",
+                    "We need a quick guide on SLA alerts."],
+    },
+    "feature_request": {
+        "label": "positive",
+        "subjects": ["Feature request: Dark mode", "Feature idea", "Request for keyboard shortcuts"],
+        "phrases": ["Dark mode would help during late-night support hours.",
+                    "Please consider this feature for {actor}.",
+                    "A bulk-edit feature for the {object} would save us time."],
+    },
+    "status_bug": {
+        "label": "negative",
+        "subjects": ["Email stuck in pending", "Status not updating", "Conversation reopened itself"],
+        "phrases": ["One of our emails is stuck in pending even after marking it resolved.",
+                    "The status of the {object} does not change for {actor}.",
+                    "Closed conversations come back as open {time}."],
+    },
+}
+
+SLOTS = {
+    "object": ["shared mailbox", "dashboard", "inbox", "conversation view", "reports page", "mobile app"],
+    "time": ["since yesterday", "this morning", "since last week", "after the latest update", "today"],
+    "actor": ["our agents", "the support team", "a new teammate", "my manager", "the night shift"],
+}
+
+FILLER = ["Hi team,", "Hello,", "Thanks in advance.", "Can you please check?",
+          "This is affecting our productivity.", "We are on the Pro plan.", "Regards, Alex"]
+
+def _fill(template: str, rng: random.Random) -> str:
+    return template.format(**{slot: rng.choice(values) for slot, values in SLOTS.items()
+                              if "{" + slot + "}" in template})
+
+def customer_ids(num_customers: int) -> List[str]:
+    return [f"CUST_{i:06d}" for i in range(num_customers)]
+
+def customer_tags(customer_id: str, seed: int = 0) -> List[str]:
+    """A customer's tag schema: 3-6 topics, fixed by seed and customer id."""
+    rng = random.Random(f"{seed}:{customer_id}")
+    return sorted(rng.sample(list(EMAIL_TOPICS), rng.randint(3, 6)))
+
+def generate_emails(count: int, num_customers: Optional[int] = None, seed: int = 0,
+                    skew: float = 1.1) -> Iterator[Dict]:
+    """
+    Yield count labeled emails: {"email_id", "customer_id", "subject", "body",
+    "tag", "label"}. Customer k (0-based) receives a share proportional to
+    1 / (k + 1) ** skew; the default customer count is count // 1000 (10+).
+    """
+    num_customers = num_customers or max(10, count // 1000)
+    customers = customer_ids(num_customers)
+    cumulative = list(accumulate(1 / (rank + 1) ** skew for rank in range(num_customers)))
+    total = cumulative[-1]
+    schemas: Dict[str, List[str]] = {}
+
+    rng = random.Random(seed)
+    for email_id in range(1, count + 1):
+        customer_id = customers[min(bisect(cumulative, rng.random() * total), num_customers - 1)]
+        tags = schemas.get(customer_id)
+        if tags is None:
+            tags = schemas[customer_id] = customer_tags(customer_id, seed)
+
+        tag = rng.choice(tags)
+        topic = EMAIL_TOPICS[tag]
+        sentences = [_fill(phrase, rng) for phrase in rng.sample(topic["phrases"], rng.randint(1, 2))]
+        if rng.random() < 0.6:
+            sentences.insert(0, rng.choice(FILLER[:2]))
+        if rng.random() < 0.5:
+            sentences.append(rng.choice(FILLER[2:]))
+        yield {"email_id": email_id, "customer_id": customer_id,
+               "subject": rng.choice(topic["subjects"]), "body": " ".join(sentences),
+               "tag": tag, "label": topic["label"]}
+
+# KB article building blocks
+FEATURES = ["automations", "SLAs", "shared mailboxes", "CSAT surveys", "tags", "billing",
+            "mail merge", "analytics", "assignment rules", "user permissions", "integrations",
+            "notifications", "collision alerts", "email templates", "reports", "round-robin"]
+
+CONTEXTS = ["for Gmail", "for Outlook", "for VIP customers", "in the mobile app", "for large teams",
+            "during onboarding", "across regions", "for shared inboxes"]
+
+MENUS = ["Admin Panel", "Settings", "Analytics", "Billing", "Workspace Admin", "Profile"]
+
+ARTICLE_SENTENCES = [
+    "To configure {feature}, go to {menu} > {Feature}.",
+    "Click 'Create New' and choose the conditions that apply {context}.",
+    "If {feature} are not appearing, check that the feature is enabled in {menu}.",
+    "Changes to {feature} may take up to {minutes} minutes to sync.",
+    "Admins can restrict who edits {feature} from {menu} > Permissions.",
+    "Use filters to limit {feature} to specific mailboxes {context}.",
+    "If you see an error, ensure your plan includes {feature}.",
+    "Reports on {feature} are available under Analytics.",
+    "You can export {feature} data as CSV from {menu}.",
+    "Contact support if {feature} still fail after these steps.",
+]
+
+TITLES = ["How to Configure {Feature}", "Troubleshooting {Feature}", "Managing {Feature} {context}",
+          "Understanding {Feature}", "Setting up {Feature} {context}"]
+
+def _article_fill(template: str, feature: str, rng: random.Random) -> str:
+    return template.format(feature=feature, Feature=feature[:1].upper() + feature[1:],
+                           menu=rng.choice(MENUS), context=rng.choice(CONTEXTS),
+                           minutes=rng.choice([5, 15, 30, 60]))
+
+def generate_articles(count: int, seed: int = 0) -> Iterator[Dict]:
+    """Yield count KB articles in KB_ARTICLES form: {"id", "title", "content", "tags"}."""
+    rng = random.Random(seed)
+    for number in range(1, count + 1):
+        feature = rng.choice(FEATURES)
+        sentences = rng.sample(ARTICLE_SENTENCES, rng.randint(4, 8))
+        yield {"id": f"kb_syn_{number:07d}",
+               "title": _article_fill(rng.choice(TITLES), feature, rng),
+               "content": " ".join(_article_fill(sentence, feature, rng) for sentence in sentences),
+               "tags": [feature, rng.choice(["setup", "troubleshooting", "configuration", "account"])]}
+
+QUERY_TEMPLATES = ["How do I configure {feature}?", "Why are {feature} not appearing?",
+                   "Can I export {feature} {context}?", "{Feature} error {context}",
+                   "Who can edit {feature}?"]
+
+def generate_queries(count: int, seed: int = 0) -> Iterator[str]:
+    """Yield count retrieval queries about the generated articles' features."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield _article_fill(rng.choice(QUERY_TEMPLATES), rng.choice(FEATURES), rng)
+
+def main(argv: Optional[List[str]] = None):
+    """Main execution function."""
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic data as JSONL")
+    parser.add_argument("kind", choices=["emails", "articles", "queries"])
+    parser.add_argument("count", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--customers", type=int, help="emails: number of customers")
+    args = parser.parse_args(argv)
+
+    if args.kind == "emails":
+        records = generate_emails(args.count, args.customers, args.seed)
+    elif args.kind == "articles":
+        records = generate_articles(args.count, args.seed)
+    else:
+        records = ({"query": query} for query in generate_queries(args.count, args.seed))
+    write = sys.stdout.write
+    for record in records:
+        write(json.dumps(record) + "\n")
+
+if __name__ == "__main__":
+    main()